@@ -1,11 +1,47 @@
-from flask import Flask, request, jsonify
+import os
+import time
+
+from flask import Flask, g, request, jsonify
 
 from services.schedule_service import ScheduleService
 from services.database_service import DatabaseService
-from services.db_constants import VALID_BUILDINGS, VALID_DAYS
+from services.metrics import CONTENT_TYPE, REGISTRY
+from services import profiler as profiling
+from services.query_service import QueryError, QueryService
+from services.response_cache import ResponseCache
 
 app = Flask(__name__)
 
+REQUEST_SECONDS = REGISTRY.histogram('api_request_seconds', 'Request latency per endpoint', ['endpoint'])
+REQUESTS = REGISTRY.counter('api_requests_total', 'Requests per endpoint and status', ['endpoint', 'status'])
+CACHE_RESULTS = REGISTRY.counter('api_response_cache_total', 'Cacheable lookups by how they were answered', ['result'])
+
+# off unless PROFILE_SAMPLE_RATE or PROFILE_TOKEN is set, see services/profiler.py
+profiler = profiling.from_env()
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    g.capture = None
+    if profiler.wanted(request.headers.get('X-Profile')):
+        g.capture = profiler.start(request.endpoint or 'unknown')
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.started, endpoint)
+    REQUESTS.inc(endpoint, response.status_code)
+    if g.capture is not None:
+        response.headers['X-Profile-File'] = os.path.basename(g.capture.stop())
+    return response
+
+@app.teardown_request
+def stop_profile(error):
+    # after_request is skipped when a view raises
+    capture = g.get('capture')
+    if capture is not None:
+        capture.stop()
+
 
 @app.route('/')
 def index():
@@ -13,43 +49,87 @@ def index():
 
 db_service = DatabaseService()
 schedule_service = ScheduleService()
+query_service = QueryService(db_service, schedule_service)
+response_cache = ResponseCache(int(os.getenv('RESPONSE_CACHE_ENTRIES', '4096')),
+                               int(os.getenv('RESPONSE_CACHE_BYTES', str(32 * 1024 * 1024))))
 
-@app.route('/get_free_floors', methods=['GET'])
-def get_free_floors():
-
-    building = request.args.get('building').lower()
-    floor = int(request.args.get('floor'))
-    day = request.args.get('day').lower()
-    min_free_time = int(request.args.get('min_free_time'))
+def cached_json(handler):
+    # handler validates request.args and returns the normalized query key and a compute() for the payload.
+    # errors are never cached. Clients revalidate (no-cache) and get a 304 while the generation holds
+    try:
+        key, compute = handler(request.args)
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if building not in VALID_BUILDINGS:
-        return jsonify({'error': f'Invalid building name. Valid buildings are: {", ".join(VALID_BUILDINGS)}'.title()}), 400
-    if day not in VALID_DAYS:
-        return jsonify({'error': f'Invalid day. Valid days are: {", ".join(VALID_DAYS)}'.title()}), 400
+    generation = db_service.current_generation()
+    etag = response_cache.etag(key, generation)
+    # a profiled request always computes, a profile of a cache hit shows nothing
+    profiling = g.capture is not None
+    if request.if_none_match.contains(etag) and not profiling:
+        response_cache.note_not_modified()
+        CACHE_RESULTS.inc('not_modified')
+        response = app.response_class(status=304)
+    else:
+        body = None if profiling else response_cache.get(key, generation)
+        if body is None:
+            CACHE_RESULTS.inc('miss')
+            try:
+                with db_service.reading() as read:
+                    response = jsonify(compute())
+            except QueryError as e:
+                return jsonify({'error': str(e)}), 400
+            # the DB may have been swapped since the generation above was read, so the body is cached and
+            # tagged with the generation it was computed from. One that straddled a swap isn't cached at all
+            if len(read) > 1:
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+            if read:
+                generation = read.pop()
+                etag = response_cache.etag(key, generation)
+            response_cache.put(key, generation, response.get_data())
+        else:
+            CACHE_RESULTS.inc('hit')
+            response = app.response_class(body, mimetype=app.json.mimetype)
 
-    time_table = db_service.get_free_floors(building, floor, day)
-    free_times = schedule_service.get_schedule_floor_inverse(time_table, min_free_time)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-    return jsonify(free_times)
+@app.route('/get_free_floors', methods=['GET'])
+def get_free_floors():
+    return cached_json(query_service.get_free_floors)
 
 @app.route('/get_free_room', methods=['GET'])
 def get_free_room():
-    building = request.args.get('building').lower()
-    room = request.args.get('room').lower()
-    day = request.args.get('day').lower()
-    min_free_time = int(request.args.get('min_free_time'))
+    return cached_json(query_service.get_free_room)
+
+@app.route('/get_free_rooms', methods=['GET'])
+def get_free_rooms():
+    # every room on campus free for the whole of start - end, optionally narrowed to a building/floor
+    return cached_json(query_service.get_free_rooms)
+
+@app.route('/catalog', methods=['GET'])
+def catalog():
+    # every building, floor and room in the current DB, the bot builds its autocomplete from it
+    return cached_json(query_service.get_catalog)
 
-    if building not in VALID_BUILDINGS:
-        return jsonify({'error': f'Invalid building name. Valid buildings are: {", ".join(VALID_BUILDINGS)}'.title()}), 400
-    if day not in VALID_DAYS:
-        return jsonify({'error': f'Invalid day. Valid days are: {", ".join(VALID_DAYS)}'.title()}), 400
-    if not db_service.check_room_exists(building, room):
-        return jsonify({'error': f'Room {room.upper()} does not exist in building {building.capitalize()}.'}), 400
+@app.route('/batch', methods=['POST'])
+def batch():
+    # see QueryService.batch for the body and response shape
+    try:
+        return jsonify(query_service.batch(request.get_json(silent=True) or {}))
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
 
-    time_table = db_service.get_free_room(building, room, day)
-    free_times = schedule_service.get_schedule_room_inverse(time_table, min_free_time)
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(response_cache.stats())
 
-    return jsonify(free_times)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text format, this worker's numbers plus the snapshots of the other workers and the bot
+    return app.response_class(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5000,debug=True)
+    # development server only, production runs under gunicorn with gunicorn.conf.py in this folder
+    app.run(host="0.0.0.0", port=int(os.getenv('API_PORT', '5000')), debug=os.getenv('FLASK_DEBUG') == '1')
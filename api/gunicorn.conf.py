@@ -0,0 +1,31 @@
+# production settings for the API, run from api/:
+#   gunicorn -c gunicorn.conf.py api:app
+# kill -HUP the master to reload code gracefully, a new DB from the scraper is picked up without one
+import multiprocessing
+import os
+
+bind = os.getenv('API_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('API_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# DatabaseService pools connections for threads, so each worker serves a few requests at once
+worker_class = 'gthread'
+threads = int(os.getenv('API_THREADS', '4'))
+
+# every worker imports the app itself and opens its own read-only connections and indexes,
+# nothing SQLite-related is shared across the fork
+preload_app = False
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# seconds between each worker's checks for a swapped-in DB
+DB_WATCH_INTERVAL = float(os.getenv('DB_WATCH_INTERVAL', '5'))
+
+
+def post_worker_init(worker):
+    # importing the app already warmed this worker's DatabaseService, keep it warm across DB swaps
+    import api
+    api.db_service.warm()
+    api.db_service.watch(DB_WATCH_INTERVAL)
+    # so /metrics on any worker can add this one's numbers in
+    api.REGISTRY.write_periodically('api')
+    worker.log.info(f"Worker {worker.pid} ready on database generation {api.db_service.generation}")
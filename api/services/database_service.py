@@ -1,10 +1,78 @@
-
+import queue
 import sqlite3
 import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from services.db_constants import SCHEMA_VERSION
+from services.interval_index import IntervalIndex
+from services.occupancy import OccupancyIndex
+from services.room_catalog import RoomCatalog
+
+# the indexes in src/database.py are built around these shapes, benchmarks/bench_queries.py
+# fails if any of them stops being a pure index search
+# free intervals are precomputed by the scraper, so any min_free_time is a filter on free_times.
+# only rooms with a class that day are listed, rooms without a long enough gap come back with NULLs
+FLOOR_FREE_SQL = """
+    SELECT c.room, f.start_time, f.end_time 
+    FROM buildings b
+    JOIN classrooms c ON c.building_id = b.id
+    LEFT JOIN free_times f ON f.room_id = c.id AND f.day = :day AND f.length >= :min_free_time
+    WHERE b.name = :building AND c.floor = :floor 
+      AND EXISTS (SELECT 1 FROM times t WHERE t.room_id = c.id AND t.day = :day)
+    ORDER BY c.room, c.id, f.start_time 
+"""
+
+# ordering by c.id as well lets SQLite walk the indexes in order instead of sorting in a temp b-tree
+ROOM_FREE_SQL = """
+    SELECT f.start_time, f.end_time 
+    FROM buildings b
+    JOIN classrooms c ON c.building_id = b.id
+    JOIN free_times f ON f.room_id = c.id
+    WHERE b.name = :building AND c.room = :room AND f.day = :day AND f.length >= :min_free_time 
+    ORDER BY c.id, f.start_time
+"""
+
+
+# batched forms of the two queries above for POST /batch, {values} is one (?, ?, ?, ?, ?) per query.
+# CROSS JOIN pins the join order (SQLite has no stats on the VALUES list and otherwise may start from
+# classrooms), so every lookup after the query list is the same index search as the single query
+# and the ORDER BY sorts only the result rows
+BATCH_FLOOR_FREE_SQL = """
+    WITH q(qid, building, floor, day, min_free_time) AS (VALUES {values})
+    SELECT q.qid, c.room, f.start_time, f.end_time 
+    FROM q
+    CROSS JOIN buildings b ON b.name = q.building
+    CROSS JOIN classrooms c ON c.building_id = b.id AND c.floor = q.floor
+    LEFT JOIN free_times f ON f.room_id = c.id AND f.day = q.day AND f.length >= q.min_free_time
+    WHERE EXISTS (SELECT 1 FROM times t WHERE t.room_id = c.id AND t.day = q.day)
+    ORDER BY q.qid, c.room, c.id, f.start_time
+"""
+
+# rooms that exist come back at least once (with NULL times if nothing is long enough)
+BATCH_ROOM_FREE_SQL = """
+    WITH q(qid, building, room, day, min_free_time) AS (VALUES {values})
+    SELECT q.qid, c.id, f.start_time, f.end_time 
+    FROM q
+    CROSS JOIN buildings b ON b.name = q.building
+    CROSS JOIN classrooms c ON c.building_id = b.id AND c.room = q.room
+    LEFT JOIN free_times f ON f.room_id = c.id AND f.day = q.day AND f.length >= q.min_free_time
+    ORDER BY q.qid, c.id, f.start_time
+"""
+
+# queries per statement, 5 parameters each stays under SQLite's default limit of 999 variables
+BATCH_SIZE = 150
+
+# 'sqlite' queries the file per request, 'memory' answers from an IntervalIndex loaded per generation
+QUERY_ENGINES = ('sqlite', 'memory')
+# every index a memory engine query can reach
+INDEX_CLASSES = (IntervalIndex, OccupancyIndex, RoomCatalog)
 
 
 class DatabaseService:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, pool_size=8, engine=None):
         if db_path is None:
             # Get to the root GS_Scraper folder
             current_file = os.path.abspath(__file__)  # .../api/services/database_service.py
@@ -17,63 +85,252 @@ class DatabaseService:
     
         print(f"Database path: {self.db_path}")
 
+        # generation of the DB snapshot new requests read from, caches should key on it
+        self.generation = None
+        self._signature = None
+        self._generation_lock = threading.Lock()
+
+        # idle read-only connections tagged with their generation, see connection()
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+
+        self.engine = engine or os.getenv('QUERY_ENGINE', 'sqlite')
+        if self.engine not in QUERY_ENGINES:
+            raise ValueError(f"Unknown query engine {self.engine!r}, expected one of {', '.join(QUERY_ENGINES)}")
+        # in-memory indexes keyed by class, each tagged with the generation it was loaded from
+        self._indexes = {}
+        self._index_lock = threading.Lock()
+        # per thread: indexes handed out by loaded_index instead of checking the file (see pinned())
+        # and the generations a request has read from (see reading())
+        self._local = threading.local()
+
+        # load up front so the first request doesn't pay for it
+        if self.check_DB():
+            self.warm()
+
     def check_DB(self):
         return os.path.exists(f'{self.db_path}')
 
-    def get_connection(self):
-        if not self.check_DB():
+    def current_generation(self):
+        # one stat per call, the generation marker itself is only read after the scraper swapped the file
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
             raise FileNotFoundError(f"Database file not found at {self.db_path}. Please run the scraper to create the database.")
 
-        print(f"Connecting to: {self.db_path}")
-        conn = sqlite3.connect(self.db_path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with self._generation_lock:
+                if signature != self._signature:
+                    self.generation = self.read_generation(stat)
+                    self._signature = signature
+                    print(f"Database generation: {self.generation}")
+        return self.generation
+
+    def read_generation(self, stat):
+        conn = self.open_connection()
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.OperationalError:
+            # no meta table in databases from before generation markers
+            meta = {}
+        finally:
+            conn.close()
+
+        if int(meta.get('schema_version', 1)) != SCHEMA_VERSION:
+            raise RuntimeError(f"{self.db_path} uses schema version {meta.get('schema_version', 1)}, "
+                               f"expected {SCHEMA_VERSION}. Run src/migrate_schema.py on it.")
+        return int(meta['generation']) if 'generation' in meta else stat.st_mtime_ns
+
+    def open_connection(self):
+        # the API never writes, so open read-only and let SQLite map the (small) file into memory
+        uri = Path(os.path.abspath(self.db_path)).as_uri() + '?mode=ro'
+        # pooled connections move between request threads, but only one thread uses each at a time
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute('PRAGMA query_only = ON')
+        # every query has a real index to use, a throwaway automatic index is always a misplan (seen on /batch)
+        conn.execute('PRAGMA automatic_index = OFF')
+        conn.execute('PRAGMA mmap_size = 67108864')
+        conn.execute('PRAGMA cache_size = -16384')
         return conn
 
+    @contextmanager
+    def connection(self):
+        # borrow a pooled connection. The scraper swaps the file with os.replace, so a connection
+        # keeps reading its snapshot, and connections from an older generation are reopened on checkout
+        generation = self.current_generation()
+        try:
+            conn_generation, conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn_generation, conn = generation, self.open_connection()
+
+        if conn_generation != generation:
+            conn.close()
+            conn_generation, conn = generation, self.open_connection()
+        self.note_read(conn_generation)
+
+        try:
+            yield conn
+        finally:
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put_nowait((conn_generation, conn))
+            else:
+                conn.close()
+
+    def loaded_index(self, index_class):
+        # reloaded when the scraper swaps in a new generation, requests already holding the old one finish on it
+        pinned = getattr(self._local, 'indexes', None)
+        if pinned is not None:
+            self.note_read(pinned[index_class].generation)
+            return pinned[index_class]
+        generation = self.current_generation()
+        index = self._indexes.get(index_class)
+        if index is None or index.generation != generation:
+            with self._index_lock:
+                index = self._indexes.get(index_class)
+                if index is None or index.generation != generation:
+                    with self.connection() as conn:
+                        index = index_class.load(conn, generation)
+                    self._indexes[index_class] = index
+                    print(f"{index_class.__name__} for generation {generation}: {index.describe()}")
+        self.note_read(index.generation)
+        return index
+
+    @contextmanager
+    def reading(self):
+        # collects the generation of every index and connection used in the block, so a response is
+        # tagged with the snapshot it was computed from, not the one current when the request began
+        read = set()
+        self._local.generations = read
+        try:
+            yield read
+        finally:
+            self._local.generations = None
+
+    def note_read(self, generation):
+        read = getattr(self._local, 'generations', None)
+        if read is not None:
+            read.add(generation)
+
+    def interval_index(self):
+        return self.loaded_index(IntervalIndex)
+
+    def ready_indexes(self):
+        # the memory engine's indexes if every one is loaded for the file on disk, otherwise None.
+        # only a stat, never SQLite: a file swapped since the generation was read isn't ready until
+        # current_generation() and loaded_index() have run somewhere that may block
+        if self.engine != 'memory':
+            return None
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None
+        # current_generation() sets generation before _signature, so a matching signature has its generation
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._signature:
+            return None
+        generation = self.generation
+        indexes = {index_class: self._indexes.get(index_class) for index_class in INDEX_CLASSES}
+        if all(getattr(index, 'generation', None) == generation for index in indexes.values()):
+            return indexes
+        return None
+
+    @contextmanager
+    def pinned(self, indexes):
+        # queries in this block use these indexes (from ready_indexes) as they are, even if the file is
+        # swapped meanwhile, so they never reload anything inline
+        self._local.indexes = indexes
+        try:
+            yield
+        finally:
+            self._local.indexes = None
+
+    def warm(self):
+        # open a pooled connection and load whatever the current generation needs, callers keep this
+        # off their request path (startup, the watch thread, a thread in the bot's embedded mode)
+        with self.connection():
+            pass
+        self.room_catalog()
+        self.occupancy_index()
+        if self.engine == 'memory':
+            self.interval_index()
+
+    def watch(self, interval):
+        # after the scraper swaps in a new DB, reload in the background so no request waits on it
+        def run():
+            while True:
+                time.sleep(interval)
+                if not self.check_DB():
+                    continue
+                try:
+                    self.warm()
+                except Exception as e:
+                    print(f"Reloading {self.db_path} failed: {e}")
+
+        threading.Thread(target=run, name='db-watch', daemon=True).start()
+
+    def occupancy_index(self):
+        return self.loaded_index(OccupancyIndex)
+
+    def room_catalog(self):
+        # loaded for both engines, request validation uses it
+        return self.loaded_index(RoomCatalog)
+
     def check_room_exists(self, building, room):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT 1 
-            FROM classrooms 
-            WHERE building = ? AND room = ? 
-            LIMIT 1
-        """, (building, room))
-
-        exists = cursor.fetchone() is not None
-        conn.close()
-        return exists
-
-    def get_free_floors(self, building, floor, day):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        SELECT room, start_time, end_time 
-        FROM times 
-        WHERE building = ? AND floor = ? AND day = ? 
-        ORDER BY room, start_time 
-        """, (building, floor, day))
-
-        occupied_times = cursor.fetchall()
-
-        print(f"raw DB response: {occupied_times}")
-
-        conn.close()
-        return occupied_times
-
-    def get_free_room(self, building, room, day):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT room, start_time, end_time 
-            FROM times 
-            WHERE building = ? AND room = ? AND day = ? 
-            ORDER BY room, start_time
-        """, (building, room, day))
-
-        occupied_times = cursor.fetchall()
-        print(f" raw DB for {building, room, day}: {occupied_times}")
-
-        conn.close()
-        return occupied_times
+        return self.room_catalog().has_room(building, room)
+
+    # day is an index into VALID_DAYS, times come back as minutes since midnight
+    def get_free_floors(self, building, floor, day, min_free_time):
+        if self.engine == 'memory':
+            return self.interval_index().get_free_floors(building, floor, day, min_free_time)
+        free_times = {}
+        with self.connection() as conn:
+            params = {'building': building, 'floor': floor, 'day': day, 'min_free_time': min_free_time}
+            for room, start, end in conn.execute(FLOOR_FREE_SQL, params):
+                room_times = free_times.setdefault(room, [])
+                if start is not None:
+                    room_times.append((start, end))
+        return free_times
+
+    def get_free_room(self, building, room, day, min_free_time):
+        if self.engine == 'memory':
+            return self.interval_index().get_free_room(building, room, day, min_free_time)
+        with self.connection() as conn:
+            params = {'building': building, 'room': room, 'day': day, 'min_free_time': min_free_time}
+            return conn.execute(ROOM_FREE_SQL, params).fetchall()
+
+    # start/end are minutes since midnight, every room in the DB is checked, not only ones with classes that day
+    def get_free_between(self, day, start, end, building=None, floor=None, min_free_time=0):
+        return self.occupancy_index().free_between(day, start, end, building, floor, min_free_time)
+
+    def get_free_batch(self, floor_queries, room_queries):
+        # floor_queries are (building, floor, day, min_free_time), room_queries (building, room, day, min_free_time).
+        # Returns one result per query in the same order, the same as get_free_floors / get_free_room,
+        # except rooms that don't exist come back as None. All statements share one connection
+        if self.engine == 'memory':
+            index = self.interval_index()
+            return ([index.get_free_floors(*query) for query in floor_queries],
+                    [index.get_free_room(*query) if index.check_room_exists(*query[:2]) else None
+                     for query in room_queries])
+
+        floor_results = [{} for _ in floor_queries]
+        room_results = [None] * len(room_queries)
+        with self.connection() as conn:
+            for qid, room, start, end in self.run_batch(conn, BATCH_FLOOR_FREE_SQL, floor_queries):
+                room_times = floor_results[qid].setdefault(room, [])
+                if start is not None:
+                    room_times.append((start, end))
+
+            for qid, _, start, end in self.run_batch(conn, BATCH_ROOM_FREE_SQL, room_queries):
+                if room_results[qid] is None:
+                    room_results[qid] = []
+                if start is not None:
+                    room_results[qid].append((start, end))
+        return floor_results, room_results
+
+    def run_batch(self, conn, sql, queries):
+        rows = []
+        for first in range(0, len(queries), BATCH_SIZE):
+            chunk = queries[first:first + BATCH_SIZE]
+            params = [value for qid, query in enumerate(chunk, first) for value in (qid, *query)]
+            rows.extend(conn.execute(sql.format(values=', '.join(['(?, ?, ?, ?, ?)'] * len(chunk))), params))
+        return rows
@@ -1,23 +1,12 @@
+# shared by the API and the scraper in src/, which imports them with api/ on sys.path
+
+# days are stored as their index here, times as minutes since midnight
 VALID_DAYS = ['mo', 'tu', 'we', 'th', 'fr', 'sa', 'su']
 
-# could pull from db but hardcoded for simplicity
-VALID_BUILDINGS = {
-    'campbell',
-    'colwin',
-    'delany',
-    'g building',
-    'gymnasium',
-    'honors',
-    'i building',
-    'kiely hall',
-    'king hall',
-    'kissena',
-    'klapper',
-    'music',
-    'powdermker',
-    'queenshall',
-    'rathaus',
-    'remsen',
-    'rosenthal',
-    'science'
-}
+# the schema src/database.py writes, bump when the table layout changes. src/migrate_schema.py
+# upgrades older files and the API refuses to read them
+SCHEMA_VERSION = 3
+
+# free intervals are computed over 7 AM to 10 PM
+DAY_START = 7 * 60
+DAY_END = 22 * 60
@@ -0,0 +1,164 @@
+# in-memory alternative to the SQLite queries in DatabaseService, enabled with QUERY_ENGINE=memory.
+# a term's schedule is a few thousand rows, so the whole times table is loaded once per DB generation
+# and floor/room queries become slices of compact arrays instead of SQL round trips
+import sys
+import time
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+from services.db_constants import DAY_END, DAY_START
+from services.schedule_service import find_free_gaps
+
+DAYS = 7
+
+# same order as the SQL queries return rooms in: floor slices are contiguous, rooms sorted inside them
+CLASSROOMS_SQL = """
+    SELECT b.name, c.id, c.floor, c.room
+    FROM classrooms c
+    JOIN buildings b ON b.id = c.building_id
+    ORDER BY b.name, c.floor, c.room, c.id
+"""
+
+TIMES_SQL = """
+    SELECT room_id, day, start_time, end_time
+    FROM times
+    ORDER BY room_id, day, start_time
+"""
+
+
+class DayIndex:
+    # free intervals of every room in a building on one day, room i owns starts/ends[offsets[i]:offsets[i + 1]]
+    __slots__ = ('has_class', 'offsets', 'starts', 'ends')
+
+    def __init__(self, has_class, offsets, starts, ends):
+        # numpy slices in, plain arrays kept so lookups index Python ints
+        self.has_class = bytearray(has_class.astype(np.uint8).tobytes())
+        self.offsets = array('I', offsets.astype(np.uint32).tobytes())
+        self.starts = array('H', starts.astype(np.uint16).tobytes())
+        self.ends = array('H', ends.astype(np.uint16).tobytes())
+
+    def free_times(self, slot, min_free_time):
+        starts, ends = self.starts, self.ends
+        return [(starts[i], ends[i]) for i in range(self.offsets[slot], self.offsets[slot + 1])
+                if ends[i] - starts[i] >= min_free_time]
+
+    def size(self):
+        return sum(sys.getsizeof(part) for part in (self.has_class, self.offsets, self.starts, self.ends))
+
+
+class BuildingIndex:
+    __slots__ = ('rooms', 'floors', 'room_slots', 'days')
+
+    def __init__(self):
+        self.rooms = []  # room name per slot
+        self.floors = {}  # floor -> (first slot, last slot + 1)
+        self.room_slots = defaultdict(list)  # room name -> slots, one per floor the name appears on
+        self.days = []
+
+    def size(self):
+        return (sys.getsizeof(self.rooms) + sum(sys.getsizeof(room) for room in self.rooms)
+                + sys.getsizeof(self.floors) + sum(sys.getsizeof(slots) for slots in self.floors.values())
+                + sys.getsizeof(self.room_slots) + sum(sys.getsizeof(slots) for slots in self.room_slots.values())
+                + sum(day.size() for day in self.days))
+
+
+class IntervalIndex:
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.buildings = {}
+        self.interval_count = 0
+        self.load_seconds = 0.0
+        self.memory_bytes = 0
+
+    @classmethod
+    def load(cls, conn, generation, day_start=DAY_START, day_end=DAY_END):
+        start = time.perf_counter()
+        index = cls(generation)
+
+        classrooms = conn.execute(CLASSROOMS_SQL).fetchall()
+        times = np.array(conn.execute(TIMES_SQL).fetchall(), dtype=np.int64).reshape(-1, 4)
+
+        # slots number the classrooms in CLASSROOMS_SQL order, so every building is a contiguous slot range
+        room_ids = np.array([room_id for _, room_id, _, _ in classrooms], dtype=np.int64)
+        slot_of = np.full(int(room_ids.max(initial=0)) + 1, -1, dtype=np.int64)
+        slot_of[room_ids] = np.arange(len(classrooms))
+        slots = slot_of[times[:, 0]]
+
+        # one batch per day over the whole campus, then sliced per building below
+        days = []
+        for day in range(DAYS):
+            on_day = times[:, 1] == day
+            gap_slots, gap_starts, gap_ends = find_free_gaps(
+                slots[on_day], times[on_day, 2], times[on_day, 3], len(classrooms), day_start, day_end)
+            has_class = np.zeros(len(classrooms), dtype=bool)
+            has_class[slots[on_day]] = True
+            offsets = np.searchsorted(gap_slots, np.arange(len(classrooms) + 1))
+            days.append((has_class, offsets, gap_starts, gap_ends))
+            index.interval_count += len(gap_slots)
+
+        first = 0
+        for slot in range(1, len(classrooms) + 1):
+            if slot == len(classrooms) or classrooms[slot][0] != classrooms[first][0]:
+                index.buildings[classrooms[first][0]] = cls.build_building(classrooms[first:slot], days, first)
+                first = slot
+
+        index.load_seconds = time.perf_counter() - start
+        index.memory_bytes = sys.getsizeof(index.buildings) + sum(
+            sys.getsizeof(name) + building.size() for name, building in index.buildings.items())
+        return index
+
+    @staticmethod
+    def build_building(rooms, days, first):
+        building = BuildingIndex()
+        for slot, (_, _, floor, room) in enumerate(rooms):
+            building.rooms.append(room)
+            building.room_slots[room].append(slot)
+            low, _ = building.floors.get(floor, (slot, slot))
+            building.floors[floor] = (low, slot + 1)
+        building.room_slots = dict(building.room_slots)
+
+        last = first + len(rooms)
+        for has_class, offsets, starts, ends in days:
+            building_offsets = offsets[first:last + 1]
+            begin, end = building_offsets[0], building_offsets[-1]
+            building.days.append(DayIndex(has_class[first:last], building_offsets - begin,
+                                          starts[begin:end], ends[begin:end]))
+        return building
+
+    def describe(self):
+        rooms = sum(len(building.rooms) for building in self.buildings.values())
+        return (f"{rooms} rooms, {self.interval_count} free intervals, "
+                f"{self.memory_bytes / 1024:.1f} KiB, loaded in {self.load_seconds * 1000:.1f} ms")
+
+    def check_room_exists(self, building, room):
+        building_index = self.buildings.get(building)
+        return building_index is not None and room in building_index.room_slots
+
+    # same results as DatabaseService.get_free_floors / get_free_room on the SQLite path
+    def get_free_floors(self, building, floor, day, min_free_time):
+        free_times = {}
+        building_index = self.buildings.get(building)
+        if building_index is None:
+            return free_times
+
+        day_index = building_index.days[day]
+        for slot in range(*building_index.floors.get(floor, (0, 0))):
+            # like the SQL, only rooms with a class that day are listed
+            if day_index.has_class[slot]:
+                room_times = free_times.setdefault(building_index.rooms[slot], [])
+                room_times.extend(day_index.free_times(slot, min_free_time))
+        return free_times
+
+    def get_free_room(self, building, room, day, min_free_time):
+        building_index = self.buildings.get(building)
+        if building_index is None:
+            return []
+
+        day_index = building_index.days[day]
+        free_times = []
+        for slot in building_index.room_slots.get(room, ()):
+            free_times.extend(day_index.free_times(slot, min_free_time))
+        return free_times
@@ -0,0 +1,208 @@
+# counters and histograms for the API and the scraper, rendered in Prometheus' text format at /metrics.
+# recording is a lock and a few additions, cheap enough to leave on everywhere.
+# the API's gunicorn workers and the bot (scraper, embedded lookups) are separate processes, so each one
+# writes a snapshot of its registry to METRICS_DIR every few seconds and /metrics serves the live
+# registry of the worker answering next to every other fresh snapshot. Each process' series carry a
+# process="<role>-<pid>" label instead of being added together: when a worker restarts or goes stale its
+# series just end, where a summed counter would drop and read as a reset to rate(). Sum by the other
+# labels in queries
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(ROOT_DIR, 'metrics'))
+# seconds between snapshot writes, a snapshot that many times older belongs to a process that's gone
+METRICS_WRITE_INTERVAL = float(os.getenv('METRICS_WRITE_INTERVAL', '15'))
+STALE_AFTER_WRITES = 4
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# seconds, from a cached lookup to a slow Global Search page
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+                   5, 10, 30)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+class Timer:
+    # with histogram.time(*labels): observes the seconds spent in the block
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.series = {}  # label values -> total
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, value=1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + value
+
+    def dump(self):
+        with self.lock:
+            return [[list(labels), total] for labels, total in self.series.items()]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [count per bucket (last one is +Inf), sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def time(self, *label_values):
+        return Timer(self, label_values)
+
+    def dump(self):
+        with self.lock:
+            return [[list(labels), list(counts), total] for labels, (counts, total) in self.series.items()]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        # set by write(), names this process in the process label
+        self.role = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def snapshot(self):
+        return {
+            metric.name: {'kind': metric.kind, 'help': metric.help, 'labels': list(metric.labels),
+                          'buckets': list(getattr(metric, 'buckets', ())), 'series': metric.dump()}
+            for metric in self.metrics.values()
+        }
+
+    def write(self, role):
+        # atomic, /metrics in another process never reads half a file
+        self.role = role
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'{self.process()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def write_periodically(self, role, interval=METRICS_WRITE_INTERVAL):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write(role)
+                except OSError as e:
+                    print(f"Writing metrics to {METRICS_DIR} failed: {e}")
+
+        threading.Thread(target=run, name='metrics-writer', daemon=True).start()
+
+    def process(self):
+        # the snapshot file name and process label, e.g. api-4242
+        return f"{self.role or 'process'}-{os.getpid()}"
+
+    def render(self):
+        # this process' live numbers plus the latest snapshot of every other process
+        snapshots = [(self.process(), self.snapshot())]
+        own = f'-{os.getpid()}.json'
+        oldest = time.time() - METRICS_WRITE_INTERVAL * STALE_AFTER_WRITES
+        for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+            try:
+                if path.endswith(own) or os.path.getmtime(path) < oldest:
+                    continue
+                with open(path) as f:
+                    snapshots.append((os.path.basename(path)[:-len('.json')], json.load(f)))
+            except (OSError, ValueError):
+                # replaced or removed while listing, picked up on the next request
+                continue
+        return render(merge(snapshots))
+
+
+def merge(snapshots):
+    # snapshots are (process, snapshot) pairs, every series gets that process as its last label
+    merged = {}
+    for process, snapshot in snapshots:
+        for name, metric in snapshot.items():
+            into = merged.setdefault(name, {**metric, 'labels': metric['labels'] + ['process'], 'series': {}})
+            if into['buckets'] != metric['buckets']:
+                continue
+            for entry in metric['series']:
+                labels = tuple(entry[0]) + (process,)
+                if metric['kind'] == 'counter':
+                    into['series'][labels] = into['series'].get(labels, 0) + entry[1]
+                else:
+                    counts, total = into['series'].get(labels, ([0] * len(entry[1]), 0.0))
+                    into['series'][labels] = ([a + b for a, b in zip(counts, entry[1])], total + entry[2])
+    return merged
+
+
+def label_text(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def render(merged):
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric['series'].items()):
+            if metric['kind'] == 'counter':
+                lines.append(f"{name}{label_text(metric['labels'], labels)} {value}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(metric['buckets'] + ['+Inf'], counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{name}_bucket{label_text(metric['labels'], labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{label_text(metric['labels'], labels)} {total}")
+            lines.append(f"{name}_count{label_text(metric['labels'], labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
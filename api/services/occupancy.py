@@ -0,0 +1,105 @@
+# campus-wide "which rooms are free between X and Y" lookups.
+# every room gets a bitmap per day with one bit per 5 minutes, built once per DB generation,
+# so a query is one AND of the window's mask against all rooms instead of a query per building/floor
+import sys
+import time
+
+import numpy as np
+
+from services.db_constants import DAY_END, DAY_START
+from services.interval_index import CLASSROOMS_SQL, DAYS, TIMES_SQL
+
+SLOT_MINUTES = 5
+SLOTS = 24 * 60 // SLOT_MINUTES
+
+
+def slot_range(start, end):
+    # slots touched by [start, end), rounded outwards so partial overlaps count as busy
+    return start // SLOT_MINUTES, -(-end // SLOT_MINUTES)
+
+
+class OccupancyIndex:
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.buildings = []  # building name per building id
+        self.room_buildings = np.empty(0, dtype=np.int32)  # building id per room
+        self.room_floors = np.empty(0, dtype=np.int32)
+        self.rooms = []  # room name per room
+        self.bitmaps = np.empty((DAYS, 0, SLOTS // 8), dtype=np.uint8)  # packed busy bits, day x room x slot
+        self.load_seconds = 0.0
+        self.memory_bytes = 0
+
+    @classmethod
+    def load(cls, conn, generation):
+        start = time.perf_counter()
+        index = cls(generation)
+
+        classrooms = conn.execute(CLASSROOMS_SQL).fetchall()
+        times = np.array(conn.execute(TIMES_SQL).fetchall(), dtype=np.int64).reshape(-1, 4)
+
+        building_ids = {}
+        for building, _, _, _ in classrooms:
+            building_ids.setdefault(building, len(building_ids))
+        index.buildings = list(building_ids)
+        index.room_buildings = np.array([building_ids[building] for building, _, _, _ in classrooms], dtype=np.int32)
+        index.room_floors = np.array([floor for _, _, floor, _ in classrooms], dtype=np.int32)
+        index.rooms = [room for _, _, _, room in classrooms]
+
+        room_ids = np.array([room_id for _, room_id, _, _ in classrooms], dtype=np.int64)
+        slot_of = np.full(int(room_ids.max(initial=0)) + 1, -1, dtype=np.int64)
+        slot_of[room_ids] = np.arange(len(classrooms))
+
+        # +1 at each class's first slot, -1 after its last, a running sum along the day is > 0 while busy
+        first, last = slot_range(np.clip(times[:, 2], 0, 24 * 60), np.clip(times[:, 3], 0, 24 * 60))
+        changes = np.zeros((DAYS, len(classrooms), SLOTS + 1), dtype=np.int16)
+        np.add.at(changes, (times[:, 1], slot_of[times[:, 0]], first), 1)
+        np.add.at(changes, (times[:, 1], slot_of[times[:, 0]], last), -1)
+        busy = np.cumsum(changes, axis=2)[:, :, :SLOTS] > 0
+        index.bitmaps = np.packbits(busy, axis=2)
+
+        index.load_seconds = time.perf_counter() - start
+        index.memory_bytes = (index.bitmaps.nbytes + index.room_buildings.nbytes + index.room_floors.nbytes
+                              + sys.getsizeof(index.rooms) + sum(sys.getsizeof(room) for room in index.rooms))
+        return index
+
+    def describe(self):
+        return (f"{len(self.rooms)} rooms, {self.memory_bytes / 1024:.1f} KiB, "
+                f"loaded in {self.load_seconds * 1000:.1f} ms")
+
+    def free_between(self, day, start, end, building=None, floor=None, min_free_time=0):
+        # returns {building: {room: (free from, free until)}} for rooms free for all of [start, end).
+        # free from/until is the whole free stretch around the window, kept inside the 7-22 day
+        # unless the window itself is outside it
+        first, last = slot_range(start, end)
+        window = np.zeros(SLOTS, dtype=bool)
+        window[first:last] = True
+        mask = np.packbits(window)
+
+        candidates = ~(self.bitmaps[day] & mask).any(axis=1)
+        if building is not None:
+            if building not in self.buildings:
+                return {}
+            candidates &= self.room_buildings == self.buildings.index(building)
+        if floor is not None:
+            candidates &= self.room_floors == floor
+
+        rooms = np.flatnonzero(candidates)
+        # busy slots with a busy sentinel on both ends of the day, so every search below finds one
+        busy = np.ones((len(rooms), SLOTS + 2), dtype=bool)
+        busy[:, 1:-1] = np.unpackbits(self.bitmaps[day, rooms], axis=1)[:, :SLOTS]
+
+        # last busy slot before the window and first busy slot after it, for all candidates at once
+        free_from = (first - busy[:, first::-1].argmax(axis=1)) * SLOT_MINUTES
+        free_until = (last + busy[:, last + 1:].argmax(axis=1)) * SLOT_MINUTES
+
+        free_from = np.maximum(free_from, min(DAY_START, start))
+        free_until = np.minimum(free_until, max(DAY_END, end))
+        long_enough = free_until - free_from >= min_free_time
+
+        free_rooms = {}
+        for room, room_from, room_until in zip(rooms[long_enough].tolist(), free_from[long_enough].tolist(),
+                                               free_until[long_enough].tolist()):
+            building_rooms = free_rooms.setdefault(self.buildings[self.room_buildings[room]], {})
+            building_rooms.setdefault(self.rooms[room], (room_from, room_until))
+        return free_rooms
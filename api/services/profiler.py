@@ -0,0 +1,109 @@
+# opt-in cProfile captures for slow API requests and whole scrapes, written to PROFILE_DIR as
+# <time>-<name>.prof (open with pstats or snakeviz) next to a .txt summary of the top functions.
+# only the newest PROFILE_KEEP captures are kept. One capture runs at a time per process, a request
+# that would start a second one just isn't profiled
+import cProfile
+import glob
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(ROOT_DIR, 'profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+# functions listed in each summary, by cumulative and by own time
+SUMMARY_LINES = 25
+
+
+class Capture:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.path = None
+        self.stopped = False
+        # cProfile only sees the thread (or event loop) that enabled it
+        self.profile.enable()
+
+    def stop(self):
+        # returns the .prof path, or None if this capture was already stopped. Flagged before saving,
+        # so a stop after a failed save doesn't save again and release the lock twice
+        if self.stopped:
+            return None
+        self.stopped = True
+        self.profile.disable()
+        elapsed = time.perf_counter() - self.started
+        try:
+            self.path = self.profiler.save(self, elapsed)
+        finally:
+            self.profiler.lock.release()
+        return self.path
+
+
+class Profiler:
+    def __init__(self, directory=PROFILE_DIR, keep=PROFILE_KEEP, sample_rate=0.0, token=None):
+        self.directory = directory
+        self.keep = keep
+        # fraction of requests profiled without being asked to
+        self.sample_rate = sample_rate
+        # a request asks with an X-Profile header equal to this, no token means headers are ignored
+        self.token = token
+        self.lock = threading.Lock()
+        self.captured = 0
+
+    def wanted(self, header=None):
+        if self.token and header == self.token:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, name):
+        # None if another capture is running
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            return Capture(self, name)
+        except Exception:
+            self.lock.release()
+            raise
+
+    def save(self, capture, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', capture.name)
+        base = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.captured}-{name}")
+        self.captured += 1
+
+        capture.profile.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w') as f:
+            f.write(summary(capture.profile, capture.name, elapsed))
+        self.rotate()
+        return base + '.prof'
+
+    def rotate(self):
+        captures = sorted(glob.glob(os.path.join(self.directory, '*.prof')), key=os.path.getmtime)
+        for path in captures[:max(len(captures) - self.keep, 0)]:
+            for old in (path, path[:-len('.prof')] + '.txt'):
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+
+def summary(profile, name, elapsed):
+    out = io.StringIO()
+    out.write(f'{name}: {elapsed * 1000:.1f} ms wall time\n\n')
+    stats = pstats.Stats(profile, stream=out)
+    stats.strip_dirs()
+    for order in ('cumulative', 'tottime'):
+        out.write(f'top {SUMMARY_LINES} by {order}\n')
+        stats.sort_stats(order).print_stats(SUMMARY_LINES)
+    return out.getvalue()
+
+
+def from_env():
+    # PROFILE_SAMPLE_RATE=0.01 profiles 1% of requests, PROFILE_TOKEN enables the X-Profile header
+    return Profiler(sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '0')), token=os.getenv('PROFILE_TOKEN') or None)
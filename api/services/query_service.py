@@ -0,0 +1,187 @@
+# request handling shared by the Flask routes in api.py and the bot's embedded mode (src/embedded_client.py):
+# validates the raw parameters, then hands back a normalized cache key and a function computing the payload
+from services.db_constants import VALID_DAYS
+from services.metrics import REGISTRY
+
+# most queries one batch may carry, a week of every floor in a big building is well under this
+MAX_BATCH_QUERIES = 500
+
+# where a payload's time goes: 'db' is the lookup (SQLite or the in-memory indexes), 'format' building the JSON shape
+STAGE_SECONDS = REGISTRY.histogram('api_query_stage_seconds', 'Time per query stage', ['query', 'stage'])
+
+
+class QueryError(Exception):
+    # a bad request, the message is sent back as {'error': message} with a 400
+    pass
+
+
+def invalid_building(catalog):
+    return QueryError(f'Invalid building name. Valid buildings are: {", ".join(catalog.buildings)}'.title())
+
+
+def unknown_room(building, room):
+    return QueryError(f'Room {room.upper()} does not exist in building {building.capitalize()}.')
+
+
+def invalid_day():
+    return QueryError(f'Invalid day. Valid days are: {", ".join(VALID_DAYS)}'.title())
+
+
+def parse_clock(value):
+    # 'HH:MM' (24 hour) to minutes since midnight
+    hours, minutes = value.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60 and hours * 60 + minutes <= 24 * 60):
+        raise ValueError(value)
+    return hours * 60 + minutes
+
+
+class QueryService:
+    def __init__(self, db_service, schedule_service):
+        self.db_service = db_service
+        self.schedule_service = schedule_service
+
+    # args is anything with .get(), request.args over HTTP or a plain dict in embedded mode
+    def get_free_floors(self, args):
+        try:
+            building = str(args.get('building')).lower()
+            floor = int(args.get('floor'))
+            day = str(args.get('day')).lower()
+            min_free_time = int(args.get('min_free_time'))
+        except (TypeError, ValueError):
+            raise QueryError('Building, floor, day and min_free_time are required, floor and min_free_time as numbers.')
+
+        # buildings and rooms come from the DB's catalog, see services/room_catalog.py
+        catalog = self.db_service.room_catalog()
+        if not catalog.has_building(building):
+            raise invalid_building(catalog)
+        if day not in VALID_DAYS:
+            raise invalid_day()
+
+        def compute():
+            with STAGE_SECONDS.time('floor', 'db'):
+                free_times = self.db_service.get_free_floors(building, floor, VALID_DAYS.index(day), min_free_time)
+            with STAGE_SECONDS.time('floor', 'format'):
+                return self.schedule_service.format_floor(free_times)
+
+        return ('floor', building, floor, day, min_free_time), compute
+
+    def get_free_room(self, args):
+        try:
+            building = str(args.get('building')).lower()
+            room = str(args.get('room')).lower()
+            day = str(args.get('day')).lower()
+            min_free_time = int(args.get('min_free_time'))
+        except (TypeError, ValueError):
+            raise QueryError('Building, room, day and min_free_time are required, min_free_time as a number.')
+
+        catalog = self.db_service.room_catalog()
+        if not catalog.has_building(building):
+            raise invalid_building(catalog)
+        if day not in VALID_DAYS:
+            raise invalid_day()
+        if not catalog.has_room(building, room):
+            raise unknown_room(building, room)
+
+        def compute():
+            with STAGE_SECONDS.time('room', 'db'):
+                free_times = self.db_service.get_free_room(building, room, VALID_DAYS.index(day), min_free_time)
+            with STAGE_SECONDS.time('room', 'format'):
+                return self.schedule_service.format_room(free_times)
+
+        return ('room', building, room, day, min_free_time), compute
+
+    def get_free_rooms(self, args):
+        # every room on campus free for the whole of start - end, optionally narrowed to a building/floor
+        day = str(args.get('day')).lower()
+        building = args.get('building')
+        floor = args.get('floor')
+        try:
+            min_free_time = int(args.get('min_free_time', 0))
+            if floor is not None:
+                floor = int(floor)
+        except (TypeError, ValueError):
+            raise QueryError('Floor and min_free_time must be numbers.')
+
+        if day not in VALID_DAYS:
+            raise invalid_day()
+        if building is not None:
+            building = str(building).lower()
+            catalog = self.db_service.room_catalog()
+            if not catalog.has_building(building):
+                raise invalid_building(catalog)
+        try:
+            start = parse_clock(args.get('start'))
+            end = parse_clock(args.get('end'))
+        except (AttributeError, ValueError):
+            raise QueryError('Start and end must be times like 14:00.')
+        if start >= end:
+            raise QueryError('Start must be before end.')
+
+        def compute():
+            with STAGE_SECONDS.time('between', 'db'):
+                free_rooms = self.db_service.get_free_between(VALID_DAYS.index(day), start, end, building, floor,
+                                                              min_free_time)
+            with STAGE_SECONDS.time('between', 'format'):
+                return self.schedule_service.format_campus(free_rooms)
+
+        return ('between', day, start, end, building, floor, min_free_time), compute
+
+    def batch(self, body):
+        # body: {"queries": [{"id": optional key, "building", "floor" or "room", "day", "min_free_time"}, ...]}
+        # returns {key: result} where key is the query's id (or its position) and result is what
+        # get_free_floors or get_free_room would return, or {"error": ...} for that query alone
+        queries = body.get('queries') if isinstance(body, dict) else None
+        if not isinstance(queries, list):
+            raise QueryError('Body must be JSON like {"queries": [...]}.')
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise QueryError(f'At most {MAX_BATCH_QUERIES} queries per batch.')
+
+        catalog = self.db_service.room_catalog()
+        results = {}
+        floor_keys, floor_queries = [], []
+        room_keys, room_queries = [], []
+        for position, query in enumerate(queries):
+            if not isinstance(query, dict):
+                results[str(position)] = {'error': 'Each query must be an object.'}
+                continue
+            key = str(query.get('id', position))
+            building = str(query.get('building', '')).lower()
+            day = str(query.get('day', '')).lower()
+
+            if not catalog.has_building(building):
+                results[key] = {'error': str(invalid_building(catalog))}
+                continue
+            if day not in VALID_DAYS:
+                results[key] = {'error': str(invalid_day())}
+                continue
+            try:
+                min_free_time = int(query.get('min_free_time', 0))
+                if 'floor' in query:
+                    floor_queries.append((building, int(query['floor']), VALID_DAYS.index(day), min_free_time))
+                    floor_keys.append(key)
+                elif 'room' in query:
+                    room_queries.append((building, str(query['room']).lower(), VALID_DAYS.index(day), min_free_time))
+                    room_keys.append(key)
+                else:
+                    results[key] = {'error': 'Each query needs a floor or a room.'}
+            except (TypeError, ValueError):
+                results[key] = {'error': 'Floor and min_free_time must be numbers.'}
+
+        with STAGE_SECONDS.time('batch', 'db'):
+            floor_results, room_results = self.db_service.get_free_batch(floor_queries, room_queries)
+        with STAGE_SECONDS.time('batch', 'format'):
+            for key, free_times in zip(floor_keys, floor_results):
+                results[key] = self.schedule_service.format_floor(free_times)
+            for key, (building, room, _, _), free_times in zip(room_keys, room_queries, room_results):
+                if free_times is None:
+                    results[key] = {'error': str(unknown_room(building, room))}
+                else:
+                    results[key] = self.schedule_service.format_room(free_times)
+
+        return results
+
+    def get_catalog(self, args):
+        # {building: [[floor, room], ...]} for the bot's autocomplete in QUERY_MODE=http
+        catalog = self.db_service.room_catalog()
+        return ('catalog',), catalog.to_json
@@ -0,0 +1,77 @@
+# LRU cache of serialized API responses. A response is fully determined by the normalized query and
+# the DB generation it was computed from, so entries are keyed on both and the ETag is derived from
+# them too, which lets a conditional request be answered with a 304 before any DB work
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=4096, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict()  # key -> body bytes, oldest first
+        self.size = 0
+        self.generation = None
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @staticmethod
+    def etag(key, generation):
+        # strong: the same key and generation always produce byte-identical bodies
+        return hashlib.blake2b(f'{generation}|{key!r}'.encode(), digest_size=16).hexdigest()
+
+    def get(self, key, generation):
+        with self.lock:
+            body = self.entries.get(key) if generation == self.generation else None
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return body
+
+    def note_not_modified(self):
+        with self.lock:
+            self.not_modified += 1
+
+    def put(self, key, generation, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if self.generation is not None and generation < self.generation:
+                # computed from a snapshot that's already been replaced, keep the newer entries
+                return
+            if generation != self.generation:
+                # a new DB snapshot makes every cached answer stale
+                self.entries.clear()
+                self.size = 0
+                self.generation = generation
+
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = body
+            self.size += len(body)
+
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'generation': self.generation,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,95 @@
+# every building, floor and room in the current DB generation. Validation is a set lookup instead of a
+# query, and the bot's autocomplete is a prefix range over sorted lists, well inside Discord's 3s deadline.
+# loaded per generation through DatabaseService.loaded_index like the other indexes, so it follows DB swaps
+import bisect
+import time
+
+CATALOG_SQL = """
+    SELECT b.name, c.floor, c.room
+    FROM classrooms c
+    JOIN buildings b ON b.id = c.building_id
+"""
+
+# the most choices Discord shows for an autocomplete
+MAX_CHOICES = 25
+
+
+def prefix_range(keys, prefix):
+    # slice of the sorted keys starting with prefix, a string or a 1-tuple for keys that are tuples
+    if isinstance(prefix, tuple):
+        return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, (prefix[0] + '\uffff',))
+    return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + '\uffff')
+
+
+class RoomCatalog:
+    def __init__(self, generation, places):
+        # places: (building, floor, room) triples, names lowercase like the DB has them
+        self.generation = generation
+        self.load_seconds = 0.0
+
+        self.places = {}  # building -> sorted (floor, room)
+        for building, floor, room in places:
+            self.places.setdefault(building, set()).add((floor, room))
+        self.buildings = sorted(self.places)
+        self.places = {building: sorted(self.places[building]) for building in self.buildings}
+
+        self.room_sets = {building: {room for _, room in pairs} for building, pairs in self.places.items()}
+        self.rooms = {building: sorted(rooms) for building, rooms in self.room_sets.items()}  # for autocomplete
+        self.floors = {building: sorted({floor for floor, _ in pairs}) for building, pairs in self.places.items()}
+
+        # 'hall' should find kiely hall and king hall, so buildings are keyed by every word they contain
+        self.building_keys = sorted(
+            (building[start:], building)
+            for building in self.buildings
+            for start in [0] + [i + 1 for i, char in enumerate(building) if char == ' ']
+        )
+        self.room_keys = sorted({room for rooms in self.rooms.values() for room in rooms})
+
+    @classmethod
+    def load(cls, conn, generation):
+        start = time.perf_counter()
+        catalog = cls(generation, conn.execute(CATALOG_SQL).fetchall())
+        catalog.load_seconds = time.perf_counter() - start
+        return catalog
+
+    @classmethod
+    def from_json(cls, payload, generation=None):
+        # the shape to_json() returns and GET /catalog serves
+        return cls(generation, [(building, floor, room) for building, places in payload.items()
+                                for floor, room in places])
+
+    def to_json(self):
+        # {building: [[floor, room], ...]}
+        return {building: [list(place) for place in places] for building, places in self.places.items()}
+
+    def has_building(self, building):
+        return building in self.room_sets
+
+    def has_room(self, building, room):
+        rooms = self.room_sets.get(building)
+        return rooms is not None and room in rooms
+
+    def complete_buildings(self, prefix, limit=MAX_CHOICES):
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return self.buildings[:limit]
+        start, end = prefix_range(self.building_keys, (prefix,))
+        found = []
+        for _, building in self.building_keys[start:end]:
+            if building not in found:
+                found.append(building)
+        return sorted(found)[:limit]
+
+    def complete_rooms(self, building, prefix, limit=MAX_CHOICES):
+        # rooms of the building, or of every building while none is picked yet
+        prefix = prefix.strip().lower()
+        keys = self.rooms.get(building, self.room_keys)
+        start, end = prefix_range(keys, prefix)
+        return keys[start:min(end, start + limit)]
+
+    def complete_floors(self, building, limit=MAX_CHOICES):
+        return self.floors.get(building, [])[:limit]
+
+    def describe(self):
+        return (f"{len(self.buildings)} buildings, {sum(len(rooms) for rooms in self.rooms.values())} rooms, "
+                f"loaded in {self.load_seconds * 1000:.1f} ms")
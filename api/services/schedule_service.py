@@ -1,54 +1,76 @@
-from datetime import datetime
+import numpy as np
 
-class ScheduleService:
+from services.db_constants import DAY_END, DAY_START
+
+# times are minutes since midnight end-to-end, they are only formatted as 'HH:MM' for the response
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
 
-    # todo: combine these two functions into one
-    def get_schedule_floor_inverse(self, time_table, min_free_time):
-        # day starts at 7 AM and ends at 10 PM
-        day_start = datetime.strptime("07:00", "%H:%M")
-        day_end = datetime.strptime("22:00", "%H:%M")
 
-        # room : [] times
-        free_times = dict()
+def find_free_gaps(rooms, starts, ends, room_count=None, day_start=DAY_START, day_end=DAY_END, min_free_time=0):
+    # free gaps of many rooms at once. rooms are integer keys in [0, room_count), rows can be in any order
+    # and overlap. Returns (rooms, starts, ends) arrays of the gaps sorted by (room, start); with room_count,
+    # rooms that have no rows get the whole day
+    rooms = np.asarray(rooms, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if room_count is None:
+        room_count = int(rooms.max()) + 1 if len(rooms) else 0
 
-        for room in set(room for room, _, _ in time_table):
-            free_times[room] = []
-            current_time = day_start
+    order = np.lexsort((starts, rooms))
+    rooms, starts, ends = rooms[order], starts[order], ends[order]
 
-            # Filter occupied times for this specific room
-            room_times = sorted([(start, end) for r, start, end in time_table if r == room])
+    # running max of end times per room: shifting every room above the previous one's range
+    # lets one maximum.accumulate run over the whole batch without leaking between rooms
+    low = min(day_start, int(ends.min())) if len(ends) else day_start
+    span = max(day_end, int(ends.max())) - low + 1 if len(ends) else 1
+    shift = rooms * span
+    latest_end = np.maximum.accumulate(ends - low + shift) - shift + low
 
-            for start, end in room_times:
-                start_time = datetime.strptime(start, "%H:%M")
-                end_time = datetime.strptime(end, "%H:%M")
+    first = np.ones(len(rooms), dtype=bool)
+    first[1:] = rooms[1:] != rooms[:-1]
+    last = np.ones(len(rooms), dtype=bool)
+    last[:-1] = first[1:]
 
-                if current_time < start_time and (start_time - current_time).total_seconds() / 60 >= min_free_time:
-                    free_times[room].append(f"{current_time.strftime('%H:%M')} - {start_time.strftime('%H:%M')}")
-                current_time = max(current_time, end_time)
+    # where the room becomes free before each class: the day start, or the latest end so far
+    free_from = np.empty_like(starts)
+    free_from[1:] = latest_end[:-1]
+    free_from[first] = day_start
+    np.maximum(free_from, day_start, out=free_from)
 
-            # Check for any remaining free time until the end of the day
-            if current_time < day_end and (day_end - current_time).total_seconds() / 60 >= min_free_time:
-                free_times[room].append(f"{current_time.strftime('%H:%M')} - {day_end.strftime('%H:%M')}")
+    before = free_from < starts
+    after_last = np.maximum(latest_end[last], day_start)
+    tail = after_last < day_end
 
+    has_rows = np.zeros(room_count, dtype=bool)
+    has_rows[rooms] = True
+    empty = np.flatnonzero(~has_rows) if day_start < day_end else np.empty(0, dtype=np.int64)
 
-        return free_times
+    gap_rooms = np.concatenate((rooms[before], rooms[last][tail], empty))
+    gap_starts = np.concatenate((free_from[before], after_last[tail], np.full(len(empty), day_start)))
+    gap_ends = np.concatenate((starts[before], np.full(tail.sum(), day_end), np.full(len(empty), day_end)))
 
-    def get_schedule_room_inverse(self, time_table, min_free_time):
-        free_times = []
-        day_start = datetime.strptime("07:00", "%H:%M")
-        day_end = datetime.strptime("22:00", "%H:%M")
-        curr_time = day_start
+    keep = gap_ends - gap_starts >= min_free_time
+    gap_rooms, gap_starts, gap_ends = gap_rooms[keep], gap_starts[keep], gap_ends[keep]
+    order = np.lexsort((gap_starts, gap_rooms))
+    return gap_rooms[order], gap_starts[order], gap_ends[order]
 
-        for room, start, end in sorted(time_table):
-            start_time = datetime.strptime(start, "%H:%M")
-            end_time = datetime.strptime(end, "%H:%M")
 
-            if curr_time < start_time and (start_time - curr_time).total_seconds() / 60 >= min_free_time:
-                free_times.append(f"{curr_time.strftime('%H:%M')} - {start_time.strftime('%H:%M')}")
-            curr_time = max(curr_time, end_time)
+def format_interval(start, end):
+    return f"{format_minutes(start)} - {format_minutes(end)}"
+
+
+class ScheduleService:
+    # free intervals are precomputed at scrape time (free_times table), these only format them
+    def format_floor(self, free_times):
+        return {room: [format_interval(start, end) for start, end in times] for room, times in free_times.items()}
 
-        # left over
-        if curr_time < day_end and (day_end - curr_time).total_seconds() / 60 >= min_free_time:
-            free_times.append(f"{curr_time.strftime('%H:%M')} - {day_end.strftime('%H:%M')}")
+    def format_room(self, free_times):
+        return [format_interval(start, end) for start, end in free_times]
 
-        return free_times
\ No newline at end of file
+    def format_campus(self, free_rooms):
+        # building : room : free stretch around the searched window
+        return {building: {room: format_interval(start, end) for room, (start, end) in rooms.items()}
+                for building, rooms in free_rooms.items()}
@@ -0,0 +1,90 @@
+# bursts of identical bot lookups against the real Flask API (served on a local port):
+# a new aiohttp session per command (old) vs the shared ApiClient with TTL cache and coalescing.
+# reports per-command latency and how many requests reached the API
+# usage: python benchmarks/bench_api_client.py [bursts] [commands per burst]
+import asyncio
+import os
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+import aiohttp
+from werkzeug.serving import make_server
+
+import api
+from api_client import ApiClient
+
+QUERIES = [
+    ('/get_free_floors', {'building': 'kiely hall', 'floor': 2, 'day': 'mo', 'min_free_time': 30}),
+    ('/get_free_floors', {'building': 'science', 'floor': 1, 'day': 'tu', 'min_free_time': 30}),
+    ('/get_free_rooms', {'day': 'we', 'start': '14:00', 'end': '15:30', 'min_free_time': 0}),
+]
+
+
+class CountingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.requests = 0
+
+    def __call__(self, environ, start_response):
+        self.requests += 1
+        return self.app(environ, start_response)
+
+
+async def session_per_command(base_url, path, params):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f'{base_url}{path}', params=params) as response:
+            return await response.json()
+
+
+async def run(lookup, bursts, burst_size):
+    latencies = []
+
+    async def command(path, params):
+        start = time.perf_counter()
+        await lookup(path, params)
+        latencies.append(time.perf_counter() - start)
+
+    for burst in range(bursts):
+        path, params = QUERIES[burst % len(QUERIES)]
+        # a whole class running the same command at once
+        await asyncio.gather(*(command(path, params) for _ in range(burst_size)))
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def main(bursts, burst_size):
+    counter = CountingMiddleware(api.app.wsgi_app)
+    api.app.wsgi_app = counter
+    server = make_server('localhost', 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://localhost:{server.server_port}'
+
+    p50, p99 = await run(lambda path, params: session_per_command(base_url, path, params), bursts, burst_size)
+    print(f'session per command  p50 {p50 * 1e3:7.2f} ms  p99 {p99 * 1e3:7.2f} ms  '
+          f'{counter.requests} API requests')
+
+    counter.requests = 0
+    client = ApiClient(base_url, ttl=60)
+    p50, p99 = await run(client.get_json, bursts, burst_size)
+    print(f'shared ApiClient     p50 {p50 * 1e3:7.2f} ms  p99 {p99 * 1e3:7.2f} ms  '
+          f'{counter.requests} API requests  {client.stats()}')
+
+    # expired entries revalidate with If-None-Match and come back as 304s
+    counter.requests = 0
+    client.cache = {key: (0, etag, payload) for key, (_, etag, payload) in client.cache.items()}
+    p50, p99 = await run(client.get_json, len(QUERIES), 1)
+    print(f'expired, revalidated p50 {p50 * 1e3:7.2f} ms  p99 {p99 * 1e3:7.2f} ms  '
+          f'{counter.requests} API requests  {client.stats()}')
+
+    await client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 30,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 25))
@@ -0,0 +1,69 @@
+# week views through POST /batch vs one GET per (floor|room, day), through Flask's test client
+# on a large synthetic DB. Checks the batch results match the single GETs.
+# /batch skips the response cache and ETags, so the GETs run with the cache off too, otherwise every
+# repeat after the first would be a cache hit and the comparison would measure the cache
+# usage: python benchmarks/bench_batch.py [buildings] [floors] [rooms per floor]
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from bench_queries import build_db
+from services.database_service import DatabaseService
+from services.db_constants import VALID_DAYS
+from services.response_cache import ResponseCache
+
+
+def best_of(call, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(buildings=40, floors=8, rooms_per_floor=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'batch.db')
+        build_db(db_path, buildings, floors, rooms_per_floor)
+
+        import api
+        api.db_service = api.query_service.db_service = DatabaseService(db_path)
+        # every body is over max_bytes, so nothing is ever stored
+        api.response_cache = ResponseCache(max_bytes=0)
+        client = api.app.test_client()
+
+        views = {
+            'room week (7)': [{'building': 'building 1', 'room': '101', 'day': day, 'min_free_time': 30}
+                              for day in VALID_DAYS],
+            'building week (7 x floors)': [{'building': 'building 2', 'floor': floor, 'day': day, 'min_free_time': 30}
+                                           for floor in range(1, floors + 1) for day in VALID_DAYS],
+            'campus monday (buildings x floors)': [
+                {'building': f'building {b}', 'floor': floor, 'day': 'mo', 'min_free_time': 30}
+                for b in range(1, buildings + 1) for floor in range(1, floors + 1)],
+        }
+
+        for name, queries in views.items():
+            def single():
+                return [client.get('/get_free_floors' if 'floor' in query else '/get_free_room',
+                                   query_string=query).json for query in queries]
+
+            def batched():
+                return client.post('/batch', json={'queries': queries}).json
+
+            expected, got = single(), batched()
+            if [got[str(i)] for i in range(len(queries))] != expected:
+                print(f'{name}: batch results differ from single GETs')
+                sys.exit(1)
+
+            one_by_one, batch = best_of(single), best_of(batched)
+            print(f'{name:36} {len(queries):4} queries  GETs {one_by_one * 1000:8.2f} ms  '
+                  f'batch {batch * 1000:7.2f} ms  {one_by_one / batch:5.1f}x')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,94 @@
+# per-request DB overhead of DatabaseService: connect-per-call with gaps computed per request (old)
+# vs pooled read-only connections reading the precomputed free_times table
+# usage: python benchmarks/bench_db_service.py [requests] [db_path]
+import os
+import sqlite3
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from bench_gap_finder import old_floor_inverse, old_room_inverse
+from services.database_service import DatabaseService
+
+
+class ConnectPerCallService:
+    # what DatabaseService + ScheduleService did before pooling and free_times, minus the prints
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def get_connection(self):
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(self.db_path)
+        return sqlite3.connect(self.db_path)
+
+    def check_room_exists(self, building, room):
+        conn = self.get_connection()
+        exists = conn.execute('SELECT 1 FROM classrooms c JOIN buildings b ON b.id = c.building_id '
+                              'WHERE b.name = ? AND c.room = ? LIMIT 1', (building, room)).fetchone() is not None
+        conn.close()
+        return exists
+
+    def get_free_floors(self, building, floor, day, min_free_time):
+        conn = self.get_connection()
+        rows = conn.execute('SELECT c.room, t.start_time, t.end_time FROM buildings b '
+                            'JOIN classrooms c ON c.building_id = b.id JOIN times t ON t.room_id = c.id '
+                            'WHERE b.name = ? AND c.floor = ? AND t.day = ? ORDER BY c.room, t.start_time',
+                            (building, floor, day)).fetchall()
+        conn.close()
+        return old_floor_inverse(rows, min_free_time)
+
+    def get_free_room(self, building, room, day, min_free_time):
+        conn = self.get_connection()
+        rows = conn.execute('SELECT c.room, t.start_time, t.end_time FROM buildings b '
+                            'JOIN classrooms c ON c.building_id = b.id JOIN times t ON t.room_id = c.id '
+                            'WHERE b.name = ? AND c.room = ? AND t.day = ? ORDER BY c.room, t.start_time',
+                            (building, room, day)).fetchall()
+        conn.close()
+        return old_room_inverse(rows, min_free_time)
+
+
+def sample_queries(db_path):
+    conn = sqlite3.connect(db_path)
+    rooms = conn.execute('SELECT DISTINCT b.name, c.floor, c.room, t.day FROM times t '
+                         'JOIN classrooms c ON c.id = t.room_id JOIN buildings b ON b.id = c.building_id').fetchall()
+    conn.close()
+    return rooms
+
+
+def run(service, queries, requests):
+    # one /get_free_room request = existence check + room query, one /get_free_floors request = floor query
+    latencies = {'get_free_room': [], 'get_free_floors': []}
+    for i in range(requests):
+        building, floor, room, day = queries[i % len(queries)]
+
+        start = time.perf_counter()
+        service.check_room_exists(building, room)
+        service.get_free_room(building, room, day, 30)
+        latencies['get_free_room'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        service.get_free_floors(building, floor, day, 30)
+        latencies['get_free_floors'].append(time.perf_counter() - start)
+    return latencies
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main(requests, db_path):
+    queries = sample_queries(db_path)
+    services = {'connect per call': ConnectPerCallService(db_path), 'pooled read-only': DatabaseService(db_path)}
+
+    for name, service in services.items():
+        for endpoint, values in run(service, queries, requests).items():
+            print(f'{name:>17} {endpoint:16} p50 {percentile(values, 50) * 1e6:8.1f} us  '
+                  f'p99 {percentile(values, 99) * 1e6:8.1f} us')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         sys.argv[2] if len(sys.argv) > 2 else os.path.join(ROOT_DIR, 'class_time_DB.db'))
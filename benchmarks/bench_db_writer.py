@@ -0,0 +1,84 @@
+# compares the old connect/insert/commit-per-row push with the batched DBWriter
+# usage: python benchmarks/bench_db_writer.py [rows]
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import aiosqlite
+
+from database import DBWriter, initialize_tables
+
+BUILDINGS = ['kiely hall', 'powdermker', 'science', 'king hall', 'rosenthal', 'klapper']
+
+
+def synthetic_records(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        floor = rng.randint(1, 4)
+        room = f'{floor}{rng.randint(0, 60):02d}'
+        start = rng.randint(7 * 60, 20 * 60)
+        end = start + rng.choice([50, 75, 100, 165])
+        yield (rng.choice(BUILDINGS), floor, room), (rng.randint(0, 4), start, end)
+
+
+async def per_row(db_path, records):
+    conn = await aiosqlite.connect(db_path)
+    await initialize_tables(conn)
+    await conn.close()
+
+    # what db_push used to do for every meeting: connect, write the room, write the time, commit each
+    for (building, floor, room), date_time_tuple in records:
+        conn = await aiosqlite.connect(db_path)
+        await conn.execute('INSERT OR IGNORE INTO buildings (name) VALUES (?)', (building,))
+        await conn.commit()
+        await conn.execute("""
+            INSERT OR IGNORE INTO classrooms (building_id, floor, room)
+            SELECT id, ?, ? FROM buildings WHERE name = ?
+        """, (floor, room, building))
+        await conn.commit()
+        await conn.execute("""
+            INSERT OR IGNORE INTO times
+            SELECT c.id, ?, ?, ? FROM classrooms c JOIN buildings b ON b.id = c.building_id
+            WHERE b.name = ? AND c.floor = ? AND c.room = ?
+        """, date_time_tuple + (building, floor, room))
+        await conn.commit()
+        await conn.close()
+
+
+async def batched(db_path, records):
+    writer = DBWriter(db_path)
+    await writer.start()
+    for building_tuple, date_time_tuple in records:
+        await writer.put(building_tuple, date_time_tuple)
+    await writer.close()
+
+
+async def count_rows(db_path):
+    async with aiosqlite.connect(db_path) as conn:
+        async with conn.execute('SELECT COUNT(*) FROM times') as cursor:
+            return (await cursor.fetchone())[0]
+
+
+async def main(rows):
+    records = list(synthetic_records(rows))
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, push in (('per-row', per_row), ('DBWriter', batched)):
+            db_path = os.path.join(tmp, f'{name}.db')
+            start = time.perf_counter()
+            await push(db_path, records)
+            results[name] = time.perf_counter() - start
+            print(f'{name:>9}: {results[name]:8.3f}s  {rows / results[name]:10.0f} rows/s  '
+                  f'({await count_rows(db_path)} rows stored)')
+
+    print(f'speedup: {results["per-row"] / results["DBWriter"]:.1f}x')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000))
@@ -0,0 +1,65 @@
+# parity check and per-page speed of extractor.iter_sections against the old BeautifulSoup parse
+# usage: python benchmarks/bench_extractor.py [repeats]
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bs4 import BeautifulSoup
+
+from extractor import iter_sections
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'class_search_*.html')
+
+
+def bs4_sections(class_page):
+    # the extraction get_class_schedule used to run on every page
+    soup = BeautifulSoup(class_page, 'lxml')
+    sections_found = []
+
+    classes = soup.findAll('table', attrs={'class': 'classinfo'})
+    for classname in classes:
+        sections = classname.findAll('tbody')
+        for section in sections:
+            section_text = section.find('td', attrs={'data-label': 'Section'}).get_text()
+            times = [line.strip() for time in section.find_all('td', attrs={'data-label': 'DaysAndTimes'}) for line in time.stripped_strings]
+            rooms = [line.strip() for room in section.find_all('td', attrs={'data-label': 'Room'}) for line in room.stripped_strings]
+            sections_found.append((section_text, times, rooms))
+
+    return sections_found
+
+
+def per_page(parse, page, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        parse(page)
+    return (time.perf_counter() - start) / repeats
+
+
+def main(repeats):
+    failed = False
+
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path, encoding='utf-8') as f:
+            page = f.read()
+
+        expected = bs4_sections(page)
+        actual = list(iter_sections(page))
+        if actual != expected:
+            failed = True
+            print(f'PARITY FAILURE {os.path.basename(path)}: {len(actual)} sections vs {len(expected)} expected')
+            continue
+
+        bs4_time = per_page(bs4_sections, page, repeats)
+        lxml_time = per_page(lambda p: list(iter_sections(p)), page, repeats)
+        print(f'{os.path.basename(path):28} {len(page) / 1024:7.1f} KiB {len(expected):4} sections  '
+              f'bs4 {bs4_time * 1000:7.2f} ms  lxml {lxml_time * 1000:6.2f} ms  {bs4_time / lxml_time:5.1f}x')
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
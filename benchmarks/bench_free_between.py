@@ -0,0 +1,60 @@
+# campus-wide "free between X and Y": one OccupancyIndex bitmap pass vs the old way of asking
+# /get_free_floors for every building and floor and filtering the gaps
+# usage: python benchmarks/bench_free_between.py [buildings] [floors] [rooms per floor]
+import os
+import random
+import sys
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from bench_queries import build_db, time_query
+from services.database_service import DatabaseService
+
+
+def per_floor(service, buildings, floors, day, start, end):
+    # rooms without classes that day are missing from /get_free_floors, so this undercounts slightly
+    free_rooms = {}
+    for building in buildings:
+        for floor in floors:
+            for room, free_times in service.get_free_floors(building, floor, day, end - start).items():
+                if any(free_from <= start and end <= free_until for free_from, free_until in free_times):
+                    free_rooms.setdefault(building, {})[room] = True
+    return free_rooms
+
+
+def main(buildings=40, floors=8, rooms_per_floor=50, repeats=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'between.db')
+        rows = build_db(db_path, buildings, floors, rooms_per_floor)
+        print(f'{buildings * floors * rooms_per_floor} rooms, {rows} times rows\n')
+
+        service = DatabaseService(db_path)
+        building_names = [f'building {b}' for b in range(1, buildings + 1)]
+
+        rng = random.Random(1)
+        windows = []
+        for _ in range(50):
+            start = rng.randrange(7 * 60, 21 * 60, 5)
+            windows.append((rng.randrange(6), start, start + rng.choice([30, 60, 90])))
+
+        found = sum(len(rooms) for day, start, end in windows[:5]
+                    for rooms in service.get_free_between(day, start, end).values())
+        print(f'{found / 5:.0f} free rooms per window on average\n')
+
+        campus = [(day, start, end) for day, start, end in windows]
+        p50, p99 = time_query(service.get_free_between, campus, repeats)
+        print(f'bitmap, whole campus         p50 {p50 * 1e3:8.2f} ms  p99 {p99 * 1e3:8.2f} ms')
+
+        filtered = [(day, start, end, rng.choice(building_names), None, 120) for day, start, end in windows]
+        p50, p99 = time_query(service.get_free_between, filtered, repeats)
+        print(f'bitmap, one building, 2h min p50 {p50 * 1e3:8.2f} ms  p99 {p99 * 1e3:8.2f} ms')
+
+        looped = [(service, building_names, range(1, floors + 1), day, start, end) for day, start, end in windows]
+        p50, p99 = time_query(per_floor, looped, max(1, repeats // 20))
+        print(f'get_free_floors per floor    p50 {p50 * 1e3:8.2f} ms  p99 {p99 * 1e3:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
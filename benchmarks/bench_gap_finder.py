@@ -0,0 +1,141 @@
+# find_free_gaps (one NumPy batch, what build_free_times and the interval index run) vs the two
+# per-room loops it replaced.
+# first checks both agree on random time tables (overlaps, classes outside 7-22, empty rooms,
+# custom day bounds), exits non-zero on a mismatch, then times floors and whole buildings
+# usage: python benchmarks/bench_gap_finder.py [property cases]
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+import numpy as np
+
+from services.db_constants import DAY_END, DAY_START
+from services.schedule_service import find_free_gaps, format_interval, format_minutes
+
+
+# the functions as they were before find_free_gaps, day bounds made parameters for the property checks
+def old_floor_inverse(time_table, min_free_time, day_start=DAY_START, day_end=DAY_END):
+    free_times = dict()
+
+    for room in set(room for room, _, _ in time_table):
+        free_times[room] = []
+        current_time = day_start
+
+        room_times = sorted([(start, end) for r, start, end in time_table if r == room])
+
+        for start_time, end_time in room_times:
+            if current_time < start_time and start_time - current_time >= min_free_time:
+                free_times[room].append(f"{format_minutes(current_time)} - {format_minutes(start_time)}")
+            current_time = max(current_time, end_time)
+
+        if current_time < day_end and day_end - current_time >= min_free_time:
+            free_times[room].append(f"{format_minutes(current_time)} - {format_minutes(day_end)}")
+
+    return free_times
+
+
+def old_room_inverse(time_table, min_free_time, day_start=DAY_START, day_end=DAY_END):
+    free_times = []
+    curr_time = day_start
+
+    for room, start_time, end_time in sorted(time_table):
+        if curr_time < start_time and start_time - curr_time >= min_free_time:
+            free_times.append(f"{format_minutes(curr_time)} - {format_minutes(start_time)}")
+        curr_time = max(curr_time, end_time)
+
+    if curr_time < day_end and day_end - curr_time >= min_free_time:
+        free_times.append(f"{format_minutes(curr_time)} - {format_minutes(day_end)}")
+
+    return free_times
+
+
+# the same room : [] free times through find_free_gaps, or one list treating every row as one room
+def batch_floor_inverse(time_table, min_free_time, day_start=DAY_START, day_end=DAY_END):
+    if not time_table:
+        return {}
+    names, room_keys = np.unique([room for room, _, _ in time_table], return_inverse=True)
+    gap_rooms, gap_starts, gap_ends = find_free_gaps(
+        room_keys, [start for _, start, _ in time_table], [end for _, _, end in time_table],
+        len(names), day_start, day_end, min_free_time)
+
+    names = names.tolist()
+    free_times = {room: [] for room in names}
+    for room, start, end in zip(gap_rooms.tolist(), gap_starts.tolist(), gap_ends.tolist()):
+        free_times[names[room]].append(format_interval(start, end))
+    return free_times
+
+
+def batch_room_inverse(time_table, min_free_time, day_start=DAY_START, day_end=DAY_END):
+    _, gap_starts, gap_ends = find_free_gaps(
+        np.zeros(len(time_table)), [start for _, start, _ in time_table], [end for _, _, end in time_table],
+        1, day_start, day_end, min_free_time)
+    return [format_interval(start, end) for start, end in zip(gap_starts.tolist(), gap_ends.tolist())]
+
+
+def random_table(rng, rooms, classes_per_room):
+    time_table = []
+    for room in range(rooms):
+        for _ in range(rng.randint(0, classes_per_room)):
+            # mostly inside the day, some starting before 7 AM or running past 10 PM, some overlapping
+            start = rng.randint(5 * 60, 23 * 60)
+            time_table.append((f'{room:03d}', start, start + rng.randint(1, 240)))
+    rng.shuffle(time_table)
+    return time_table
+
+
+def check_properties(cases, seed=0):
+    rng = random.Random(seed)
+    for case in range(cases):
+        time_table = random_table(rng, rng.randint(0, 12), rng.randint(0, 8))
+        min_free_time = rng.choice([0, 1, 15, 30, 60, 240])
+        day_start, day_end = rng.choice([(DAY_START, DAY_END), (0, 24 * 60), (9 * 60, 17 * 60), (12 * 60, 12 * 60)])
+
+        expected = old_floor_inverse(time_table, min_free_time, day_start, day_end)
+        got = batch_floor_inverse(time_table, min_free_time, day_start, day_end)
+        if got != expected:
+            print(f'floor mismatch in case {case}: {time_table} {min_free_time} {day_start}-{day_end}\n'
+                  f'  got      {got}\n  expected {expected}')
+            return False
+
+        # room queries are the rows of one room, or none when it has no classes that day
+        room = rng.choice(time_table)[0] if time_table else None
+        room_table = [row for row in time_table if row[0] == room]
+        expected = old_room_inverse(room_table, min_free_time, day_start, day_end)
+        got = batch_room_inverse(room_table, min_free_time, day_start, day_end)
+        if got != expected:
+            print(f'room mismatch in case {case}: {room_table} {min_free_time} {day_start}-{day_end}\n'
+                  f'  got      {got}\n  expected {expected}')
+            return False
+    print(f'{cases} random tables agree')
+    return True
+
+
+def best_of(call, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(cases=3000):
+    if not check_properties(cases):
+        sys.exit(1)
+
+    rng = random.Random(1)
+    print()
+    for label, rooms in (('floor', 50), ('floor', 200), ('building', 500), ('building', 1500)):
+        time_table = random_table(rng, rooms, 8)
+        old = best_of(lambda: old_floor_inverse(time_table, 30))
+        new = best_of(lambda: batch_floor_inverse(time_table, 30))
+        print(f'{label:8} {rooms:5} rooms {len(time_table):6} rows  loops {old * 1000:8.2f} ms  '
+              f'numpy {new * 1000:7.2f} ms  {old / new:6.1f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
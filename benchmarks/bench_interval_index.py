@@ -0,0 +1,54 @@
+# QUERY_ENGINE=memory (IntervalIndex) vs the SQLite path on a large synthetic DB.
+# checks both engines return the same results, then reports load time, memory and per-query latency
+# usage: python benchmarks/bench_interval_index.py [buildings] [floors] [rooms per floor]
+import os
+import random
+import sys
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from bench_queries import build_db, time_query
+from services.database_service import DatabaseService
+
+
+def main(buildings=40, floors=8, rooms_per_floor=50, repeats=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'index.db')
+        rows = build_db(db_path, buildings, floors, rooms_per_floor)
+        print(f'{buildings * floors * rooms_per_floor} rooms, {rows} times rows\n')
+
+        rng = random.Random(1)
+        room_args = [(f'building {rng.randint(1, buildings + 1)}', f'{f}{rng.randrange(rooms_per_floor + 2):02d}')
+                     for f in (rng.randint(1, floors) for _ in range(300))]
+        floor_args = [(f'building {rng.randint(1, buildings)}', rng.randint(1, floors + 1), rng.randrange(7),
+                       rng.choice([0, 30, 60])) for _ in range(300)]
+        free_room_args = [args + (rng.randrange(7), rng.choice([0, 30, 60])) for args in room_args]
+
+        engines = {name: DatabaseService(db_path, engine=name) for name in ('sqlite', 'memory')}
+        # DatabaseService prints the index size and load time
+        engines['memory'].interval_index()
+        print()
+
+        ok = True
+        for method, args in (('check_room_exists', room_args), ('get_free_floors', floor_args),
+                             ('get_free_room', free_room_args)):
+            for call_args in args:
+                expected = getattr(engines['sqlite'], method)(*call_args)
+                got = getattr(engines['memory'], method)(*call_args)
+                if got != expected:
+                    print(f'mismatch {method}{call_args}: {got} != {expected}')
+                    ok = False
+                    break
+
+            for name, service in engines.items():
+                p50, p99 = time_query(getattr(service, method), args, repeats)
+                print(f'{name:>6} {method:18} p50 {p50 * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us')
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
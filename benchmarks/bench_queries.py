@@ -0,0 +1,122 @@
+# EXPLAIN QUERY PLAN assertions and timings for every DatabaseService query on a large synthetic DB.
+# exits non-zero if a query plan regresses to a table scan or a temp b-tree sort
+# usage: python benchmarks/bench_queries.py [buildings] [floors] [rooms per floor]
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+import aiosqlite
+
+from database import build_free_times, initialize_tables
+from services import database_service
+from services.database_service import DatabaseService
+
+# plan lines that mean SQLite is reading more than the rows it returns
+BAD_PLAN = ('SCAN ', 'USE TEMP B-TREE', 'AUTOMATIC')
+
+
+def build_db(db_path, buildings, floors, rooms_per_floor, seed=0):
+    async def create():
+        async with aiosqlite.connect(db_path) as conn:
+            await initialize_tables(conn)
+    asyncio.run(create())
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.executemany('INSERT INTO buildings (id, name) VALUES (?, ?)',
+                     [(b, f'building {b}') for b in range(1, buildings + 1)])
+    conn.executemany('INSERT INTO classrooms (building_id, floor, room) VALUES (?, ?, ?)',
+                     [(b, f, f'{f}{r:02d}') for b in range(1, buildings + 1)
+                      for f in range(1, floors + 1) for r in range(rooms_per_floor)])
+
+    times = []
+    for (room_id,) in conn.execute('SELECT id FROM classrooms'):
+        for day in range(6):
+            start = 7 * 60 + rng.randint(0, 60)
+            while start < 21 * 60:
+                end = start + rng.choice([50, 75, 100, 165])
+                times.append((room_id, day, start, end))
+                start = end + rng.choice([10, 15, 30, 60, 120])
+    conn.executemany('INSERT OR IGNORE INTO times VALUES (?, ?, ?, ?)', times)
+    conn.commit()
+    conn.close()
+
+    async def precompute():
+        async with aiosqlite.connect(db_path) as conn:
+            await build_free_times(conn)
+            await conn.execute('ANALYZE')
+            await conn.commit()
+    asyncio.run(precompute())
+    return len(times)
+
+
+def check_plan(conn, name, sql, params):
+    plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+    bad = [line for line in plan if line.startswith(BAD_PLAN)]
+    status = 'FAIL' if bad else 'ok'
+    print(f'[{status}] {name}')
+    for line in plan:
+        print(f'       {line}')
+    return not bad
+
+
+def time_query(call, args, repeats):
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        call(*args[i % len(args)])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main(buildings=40, floors=8, rooms_per_floor=50, repeats=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'queries.db')
+        rows = build_db(db_path, buildings, floors, rooms_per_floor)
+        print(f'{buildings * floors * rooms_per_floor} rooms, {rows} times rows + free_times, '
+              f'{os.path.getsize(db_path) / 2 ** 20:.1f} MiB\n')
+
+        rng = random.Random(1)
+        room_args = [(f'building {rng.randint(1, buildings)}', f'{f}{rng.randrange(rooms_per_floor):02d}')
+                     for f in (rng.randint(1, floors) for _ in range(200))]
+        floor_args = [(f'building {rng.randint(1, buildings)}', rng.randint(1, floors), rng.randrange(6),
+                       rng.choice([0, 30, 60])) for _ in range(200)]
+        free_room_args = [args + (rng.randrange(6), rng.choice([0, 30, 60])) for args in room_args]
+
+        service = DatabaseService(db_path)
+        # (name, sql, named params of the first call, service method, positional args)
+        queries = [
+            ('get_free_floors', database_service.FLOOR_FREE_SQL,
+             dict(zip(('building', 'floor', 'day', 'min_free_time'), floor_args[0])),
+             service.get_free_floors, floor_args),
+            ('get_free_room', database_service.ROOM_FREE_SQL,
+             dict(zip(('building', 'room', 'day', 'min_free_time'), free_room_args[0])),
+             service.get_free_room, free_room_args),
+        ]
+
+        ok = True
+        with service.connection() as conn:
+            for name, sql, params, _, _ in queries:
+                ok = check_plan(conn, name, sql, params) and ok
+
+        print()
+        for name, _, _, call, args in queries:
+            p50, p99 = time_query(call, args, repeats)
+            print(f'{name:18} p50 {p50 * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us')
+
+    if not ok:
+        print('\nquery plan regression, see FAIL above')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,82 @@
+# bot lookup latency in QUERY_MODE=http (ApiClient against the real API on a local port, TTL cache off)
+# vs QUERY_MODE=embedded with the memory and sqlite engines. Checks every mode returns the same payloads
+# usage: python benchmarks/bench_query_modes.py [rounds]
+import asyncio
+import os
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from werkzeug.serving import make_server
+
+import api
+from api_client import ApiClient
+from embedded_client import EmbeddedClient
+from services.db_constants import VALID_DAYS
+
+LOOKUPS = {
+    'floor': ('get', '/get_free_floors', {'building': 'kiely hall', 'floor': 2, 'day': 'mo', 'min_free_time': 30}),
+    'room': ('get', '/get_free_room', {'building': 'science', 'room': 'c205', 'day': 'tu', 'min_free_time': 30}),
+    'campus': ('get', '/get_free_rooms', {'day': 'we', 'start': '14:00', 'end': '15:30', 'min_free_time': 0}),
+    'week': ('post', '/batch', {'queries': [{'id': day, 'building': 'science', 'room': 'c205', 'day': day,
+                                             'min_free_time': 30} for day in VALID_DAYS]}),
+}
+
+
+async def lookup(client, method, path, params):
+    if method == 'get':
+        return await client.get_json(path, params)
+    return await client.post_json(path, params)
+
+
+async def measure(client, rounds):
+    results = {}
+    for name, (method, path, params) in LOOKUPS.items():
+        payload = await lookup(client, method, path, params)
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await lookup(client, method, path, params)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        results[name] = (payload, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)])
+    return results
+
+
+async def main(rounds):
+    server = make_server('localhost', 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # ttl=0: every lookup goes to the API, a repeat lookup revalidates with its ETag
+    http = ApiClient(f'http://localhost:{server.server_port}', ttl=0)
+    modes = {
+        'http': http,
+        'embedded memory': EmbeddedClient(api.db_service.db_path, engine='memory'),
+        'embedded sqlite': EmbeddedClient(api.db_service.db_path, engine='sqlite'),
+    }
+
+    results = {name: await measure(client, rounds) for name, client in modes.items()}
+    for name, client in modes.items():
+        await client.close()
+    server.shutdown()
+
+    print()
+    ok = True
+    for lookup_name in LOOKUPS:
+        expected = results['http'][lookup_name][0]
+        for mode, mode_results in results.items():
+            payload, p50, p99 = mode_results[lookup_name]
+            if payload != expected:
+                print(f'{mode} returned a different {lookup_name} payload')
+                ok = False
+            print(f'{lookup_name:7} {mode:16} p50 {p50 * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us')
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
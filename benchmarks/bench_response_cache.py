@@ -0,0 +1,62 @@
+# per-request latency of the API with the response cache off, warm, and answering If-None-Match with 304s
+# usage: python benchmarks/bench_response_cache.py [requests]
+import os
+import random
+import sqlite3
+import sys
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+import api
+from services.db_constants import VALID_DAYS
+from services.response_cache import ResponseCache
+
+
+def sample_queries(db_path):
+    conn = sqlite3.connect(db_path)
+    floors = conn.execute('SELECT DISTINCT b.name, c.floor FROM classrooms c '
+                          'JOIN buildings b ON b.id = c.building_id').fetchall()
+    conn.close()
+    rng = random.Random(0)
+    return [('/get_free_floors', {'building': building, 'floor': floor, 'day': rng.choice(VALID_DAYS),
+                                  'min_free_time': rng.choice([0, 30, 60])})
+            for building, floor in floors for _ in range(3)]
+
+
+def run(client, queries, requests, etags=None):
+    latencies = []
+    for i in range(requests):
+        path, params = queries[i % len(queries)]
+        headers = {'If-None-Match': etags[i % len(queries)]} if etags else {}
+        start = time.perf_counter()
+        response = client.get(path, query_string=params, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == (304 if etags else 200)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main(requests=3000):
+    queries = sample_queries(api.db_service.db_path)
+    client = api.app.test_client()
+
+    api.response_cache = ResponseCache(max_entries=0)
+    results = {'cache off': run(client, queries, requests)}
+
+    api.response_cache = ResponseCache()
+    run(client, queries, len(queries))
+    results['cache warm'] = run(client, queries, requests)
+
+    etags = [client.get(path, query_string=params).headers['ETag'] for path, params in queries]
+    results['If-None-Match 304'] = run(client, queries, requests, etags)
+
+    print(f'{len(queries)} distinct /get_free_floors queries, {requests} requests each run')
+    for name, (p50, p99) in results.items():
+        print(f'{name:18} p50 {p50 * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us')
+    print(api.response_cache.stats())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
@@ -0,0 +1,61 @@
+# RoomCatalog on a large synthetic DB: load time, autocomplete latency (what the bot pays per keystroke)
+# and room validation as a set lookup vs the SQL existence query it replaced. Checks both agree
+# usage: python benchmarks/bench_room_catalog.py [buildings] [floors] [rooms per floor]
+import os
+import random
+import sys
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+
+from bench_queries import build_db, time_query
+from services.database_service import DatabaseService
+from services.room_catalog import RoomCatalog
+
+ROOM_EXISTS_SQL = """
+    SELECT 1
+    FROM classrooms c
+    JOIN buildings b ON b.id = c.building_id
+    WHERE b.name = ? AND c.room = ?
+    LIMIT 1
+"""
+
+
+def main(buildings=40, floors=8, rooms_per_floor=50, repeats=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'catalog.db')
+        build_db(db_path, buildings, floors, rooms_per_floor)
+        service = DatabaseService(db_path)
+        catalog = service.room_catalog()
+        print(catalog.describe())
+
+        rng = random.Random(2)
+        # half real rooms, half typos
+        room_args = [(f'building {rng.randint(1, buildings)}',
+                      f'{rng.randint(1, floors + 1)}{rng.randrange(rooms_per_floor * 2):02d}') for _ in range(500)]
+        with service.connection() as conn:
+            for building, room in room_args:
+                exists = conn.execute(ROOM_EXISTS_SQL, (building, room)).fetchone() is not None
+                if exists != catalog.has_room(building, room):
+                    print(f'catalog disagrees with the classrooms table on {building} {room}')
+                    sys.exit(1)
+
+            def sql_exists(building, room):
+                return conn.execute(ROOM_EXISTS_SQL, (building, room)).fetchone() is not None
+
+            building_prefixes = [(name[:rng.randint(0, len(name))],) for name in (catalog.buildings * 5)[:500]]
+            room_prefixes = [(building, room[:rng.randint(0, 3)]) for building, room in room_args]
+            for name, call, args in (
+                ('room exists (SQL)', sql_exists, room_args),
+                ('room exists (catalog)', catalog.has_room, room_args),
+                ('complete buildings', catalog.complete_buildings, building_prefixes),
+                ('complete rooms', catalog.complete_rooms, room_prefixes),
+                ('from /catalog json', lambda payload: RoomCatalog.from_json(payload), [(catalog.to_json(),)]),
+            ):
+                p50, p99 = time_query(call, args, repeats if 'json' not in name else 20)
+                print(f'{name:22} p50 {p50 * 1e6:9.1f} us  p99 {p99 * 1e6:9.1f} us')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
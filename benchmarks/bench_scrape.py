@@ -0,0 +1,93 @@
+# end to end scrape throughput against the local Global Search stand-in (gs_server.py): pages/s, rows/s
+# and where the time goes per page, fetch (request + rate limiter), parse (worker process or snapshot
+# reuse), queue (handing rows to the DBWriter) and commit (the writer's transactions, which overlap
+# the rest). Runs a full scrape, then a refresh against the first run's page snapshots
+# usage: python benchmarks/bench_scrape.py [majors] [latency ms] [error rate] [workers] [synthetic|fixtures]
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+
+import database
+import scraper as scraper_module
+from database import DBWriter
+from gs_server import GlobalSearchStandIn, start
+from scraper import Scraper
+
+
+def timed(timings, stage, call):
+    async def wrapper(*args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            timings[stage] += time.perf_counter() - start_time
+    return wrapper
+
+
+async def scrape(url, db_path, workers, previous_path=None):
+    async def snapshots():
+        return await database.load_page_snapshots(previous_path) if previous_path else {}
+    scraper_module.load_page_snapshots = snapshots
+
+    timings = defaultdict(float)
+    writer = DBWriter(db_path)
+    await writer.start()
+    writer._flush = timed(timings, 'commit', writer._flush)
+    scraper = Scraper(writer, workers=workers, requests_per_second=10000)
+    scraper.session.url = url
+    scraper.session.search = timed(timings, 'fetch', scraper.session.search)
+    scraper.db_push = timed(timings, 'queue', scraper.db_push)
+    writer.save_page = timed(timings, 'queue', writer.save_page)
+    scraper.get_class_schedule = timed(timings, 'page', scraper.get_class_schedule)
+
+    # the scraper's own logging isn't what's being measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        majors_list = await scraper.get_majors()
+        await scraper.scrape_all_schedules(majors_list)
+        await writer.flush()
+        elapsed = time.perf_counter() - start_time
+        await scraper.close()
+        await writer.close()
+
+    pages = scraper.progress['done'] + scraper.progress['failed']
+    timings['parse'] = timings['page'] - timings['fetch'] - timings['queue']
+    return elapsed, pages, scraper.progress['failed'], writer.rows_written, timings
+
+
+def report(name, elapsed, pages, failed, rows, timings):
+    print(f'{name:8} {pages} pages ({failed} failed) in {elapsed:.2f}s: '
+          f'{pages / elapsed:7.1f} pages/s {rows / elapsed:9.0f} rows/s')
+    # summed over the concurrent workers, so per page rather than a share of the wall time
+    print('         per page ' + '  '.join(f'{stage} {timings[stage] / max(pages, 1) * 1000:6.2f} ms'
+                                         for stage in ('fetch', 'parse', 'queue', 'commit')))
+
+
+async def main(majors=150, latency=0, error_rate=0.0, workers=4, source='synthetic'):
+    stand_in = GlobalSearchStandIn(majors=majors, latency=latency / 1000, error_rate=error_rate, source=source)
+    runner, url = await start(stand_in)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = os.path.join(tmp, 'full.db'), os.path.join(tmp, 'refresh.db')
+            report('full', *await scrape(url, first, workers))
+            report('refresh', *await scrape(url, second, workers, previous_path=first))
+    finally:
+        await runner.cleanup()
+    print(f"stand-in served {stand_in.counts['selections']} selections, {stand_in.counts['searches']} searches, "
+          f"{stand_in.counts['errors']} errors, {stand_in.counts['expired']} expired")
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 150,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 0,
+                     float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+                     int(sys.argv[4]) if len(sys.argv) > 4 else 4,
+                     sys.argv[5] if len(sys.argv) > 5 else 'synthetic'))
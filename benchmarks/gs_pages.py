@@ -0,0 +1,91 @@
+# synthetic Global Search pages shaped like the real CFSearchToolController output
+import random
+
+BUILDINGS = {
+    'Kiely Hall': ['1', '2', '3', '4'],
+    'Powdermker': ['1', '2'],
+    'Science': ['B', 'C', 'D', 'E'],
+    'King Hall': ['1', '2'],
+    'Rosenthal': ['2', '3'],
+    'Klapper': ['3', '4'],
+    'Razran': ['1', '3'],
+}
+NOT_ROOMS = ['Online-Asynchronous', 'TBA', 'Off-Campus', 'Online-Synchronous']
+DAY_PATTERNS = ['MoWe', 'TuTh', 'Mo', 'Tu', 'We', 'Th', 'Fr', 'MoWeFr', 'Sa']
+START_TIMES = ['7:45AM', '9:15AM', '10:05AM', '10:45AM', '12:15PM', '1:40PM', '3:10PM', '4:30PM', '6:30PM', '7:45PM']
+
+
+def majors(count=150):
+    return [(f'Subject {i:03d}', f'S{i:03d}') for i in range(count)]
+
+
+def majors_page(majors_list):
+    options = ''.join(f'<option value="{code}">{name}</option>' for name, code in majors_list)
+    return (
+        '<html><head><title>Global Class Search</title></head><body><form method="post">'
+        '<select name="subject_name" class="form-search-display">'
+        f'<option value="">--Select Subject--</option>{options}</select>'
+        '<input type="submit" name="search_btn_search" value="Search"></form></body></html>'
+    )
+
+
+def institution_page():
+    # what the controller serves when the institution/term cookie is missing or expired
+    return (
+        '<html><body><form method="post"><select name="inst_selection">'
+        '<option value="QNS01">Queens College</option></select>'
+        '<input type="submit" name="next_btn" value="Next"></form></body></html>'
+    )
+
+
+def _meeting(rng):
+    start = rng.choice(START_TIMES)
+    hour, rest = start.split(':')
+    minutes = int(hour) % 12 * 60 + int(rest[:2]) + (720 if rest.endswith('PM') else 0)
+    end = minutes + rng.choice([50, 75, 100, 110, 165])
+    suffix = 'PM' if end >= 720 else 'AM'
+    end_hour = (end // 60) % 12 or 12
+    return f'{rng.choice(DAY_PATTERNS)} {start} - {end_hour}:{end % 60:02d}{suffix}'
+
+
+def _room(rng):
+    if rng.random() < 0.12:
+        return rng.choice(NOT_ROOMS)
+    building = rng.choice(list(BUILDINGS))
+    return f'{building} {rng.choice(BUILDINGS[building])}{rng.randint(0, 60):02d}'
+
+
+def class_search_page(subject_code, career, sections=60, seed=None):
+    rng = random.Random(seed if seed is not None else f'{subject_code}-{career}')
+    courses = []
+
+    for course in range(max(1, sections // 4)):
+        bodies = []
+        for section in range(rng.randint(1, 7)):
+            session = 'Winter' if rng.random() < 0.05 else 'Regular'
+            meetings = [(_meeting(rng), _room(rng)) for _ in range(rng.choice([1, 1, 1, 2]))]
+            bodies.append(
+                '<tbody>\n<tr>'
+                f'<td data-label="Class"><a href="#">{rng.randint(10000, 99999)}</a></td>\n'
+                f'<td data-label="Section">{section + 1:02d}-LEC&nbsp;\n{session}</td>\n'
+                f'<td data-label="DaysAndTimes">{"<br/>".join(m[0] for m in meetings)}</td>\n'
+                f'<td data-label="Room"> {"<br/>".join(m[1] for m in meetings)} <!-- room --></td>\n'
+                f'<td data-label="Instructor">Staff</td>\n'
+                '<td data-label="Instruction Mode">In Person</td>\n'
+                '<td data-label="Meeting Dates">08/25/2025 - 12/22/2025</td>\n'
+                '<td data-label="Status"><img alt="Open" src="open.png"/></td>\n'
+                '<td data-label="Course Topic"></td>'
+                '</tr>\n</tbody>'
+            )
+        courses.append(
+            f'<div class="testing_msg"><span>{subject_code} {100 + course} - Course {course}</span></div>'
+            '<table class="classinfo" border="0"><thead><tr><th>Class</th><th>Section</th>'
+            '<th>Days &amp; Times</th><th>Room</th><th>Instructor</th><th>Instruction Mode</th>'
+            '<th>Meeting Dates</th><th>Status</th><th>Course Topic</th></tr></thead>\n'
+            + '\n'.join(bodies) + '</table>'
+        )
+
+    return (
+        f'<html><head><title>Search Results</title></head><body><div id="contentDivImg_{career}">'
+        + '\n'.join(courses) + '</div></body></html>'
+    )
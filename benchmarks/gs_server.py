@@ -0,0 +1,114 @@
+# local stand-in for CFSearchToolController so the scraper can be measured without touching CUNY.
+# serves the majors list for the institution POST (college_payload) and a class search page for every
+# search POST (class_search). Searches need the session cookie handed out with the majors list, without
+# it (or once it expires) the controller answers with the institution form, like the real one does.
+# pages come from gs_pages (synthetic) or are replayed from the recorded pages in fixtures/
+# usage: python benchmarks/gs_server.py [port] [majors] [latency ms] [error rate] [synthetic|fixtures]
+import asyncio
+import glob
+import os
+import random
+import sys
+import uuid
+
+from aiohttp import web
+
+import gs_pages
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'class_search_*.html')
+
+
+class GlobalSearchStandIn:
+    def __init__(self, majors=150, sections=60, latency=0.0, jitter=0.0, error_rate=0.0,
+                 expire_after=0, source='synthetic', seed=0):
+        self.majors = gs_pages.majors(majors)
+        self.sections = sections
+        # seconds added to every response, plus up to `jitter` more at random
+        self.latency = latency
+        self.jitter = jitter
+        # fraction of searches answered with a 500
+        self.error_rate = error_rate
+        # a session cookie stops working after this many searches, 0 keeps it forever
+        self.expire_after = expire_after
+        self.rng = random.Random(seed)
+
+        self.recorded = None
+        if source == 'fixtures':
+            self.recorded = [open(path, encoding='utf-8').read() for path in sorted(glob.glob(FIXTURES))]
+        self.pages = {}
+
+        # session id -> searches left, None for no limit
+        self.sessions = {}
+        self.counts = {'selections': 0, 'searches': 0, 'expired': 0, 'errors': 0}
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post('/CFGlobalSearchTool/CFSearchToolController', self.handle)
+        return app
+
+    def class_page(self, subject, career):
+        key = (subject, career)
+        if key not in self.pages:
+            if self.recorded:
+                self.pages[key] = self.recorded[len(self.pages) % len(self.recorded)]
+            else:
+                self.pages[key] = gs_pages.class_search_page(subject, career, self.sections)
+        return self.pages[key]
+
+    async def handle(self, request):
+        form = await request.post()
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.rng.random() * self.jitter)
+
+        if 'inst_selection' in form:
+            self.counts['selections'] += 1
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = self.expire_after or None
+            response = web.Response(text=gs_pages.majors_page(self.majors), content_type='text/html')
+            response.set_cookie('JSESSIONID', session_id)
+            return response
+
+        self.counts['searches'] += 1
+        session_id = request.cookies.get('JSESSIONID')
+        if session_id not in self.sessions or self.sessions[session_id] == 0:
+            self.counts['expired'] += 1
+            return web.Response(text=gs_pages.institution_page(), content_type='text/html')
+        if self.sessions[session_id] is not None:
+            self.sessions[session_id] -= 1
+
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.counts['errors'] += 1
+            return web.Response(status=500, text='Internal Server Error')
+
+        return web.Response(text=self.class_page(form.get('subject_name', ''), form.get('courseCareer', '')),
+                            content_type='text/html')
+
+
+async def start(stand_in, port=0):
+    # localhost, not 127.0.0.1: aiohttp's cookie jar ignores cookies from IP addresses
+    runner = web.AppRunner(stand_in.app())
+    await runner.setup()
+    site = web.TCPSite(runner, 'localhost', port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://localhost:{port}/CFGlobalSearchTool/CFSearchToolController'
+
+
+async def serve(port, stand_in):
+    runner, url = await start(stand_in, port)
+    print(f'Global Search stand-in at {url}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    stand_in = GlobalSearchStandIn(majors=int(sys.argv[2]) if len(sys.argv) > 2 else 150,
+                                   latency=float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.0,
+                                   error_rate=float(sys.argv[4]) if len(sys.argv) > 4 else 0.0,
+                                   source=sys.argv[5] if len(sys.argv) > 5 else 'synthetic')
+    try:
+        asyncio.run(serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765, stand_in))
+    except KeyboardInterrupt:
+        pass
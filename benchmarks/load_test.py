@@ -0,0 +1,113 @@
+# local load test for the API: starts it under gunicorn with api/gunicorn.conf.py (or uses a running one),
+# then keeps `concurrency` clients busy for `seconds` with a fixed mix of floor, room and campus lookups.
+# reports throughput and p50/p99 latency. The query mix is seeded, so runs are comparable
+# usage: python benchmarks/load_test.py [concurrency] [seconds] [workers] [url]
+import asyncio
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+API_DIR = os.path.join(ROOT_DIR, 'api')
+DB_PATH = os.path.join(ROOT_DIR, 'class_time_DB.db')
+DAYS = ['mo', 'tu', 'we', 'th', 'fr']
+
+
+def query_mix(count=2000, seed=0):
+    conn = sqlite3.connect(DB_PATH)
+    places = conn.execute('SELECT b.name, c.floor, c.room FROM classrooms c '
+                          'JOIN buildings b ON b.id = c.building_id').fetchall()
+    conn.close()
+
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        building, floor, room = rng.choice(places)
+        kind = rng.random()
+        if kind < 0.45:
+            queries.append(('/get_free_floors', {'building': building, 'floor': floor, 'day': rng.choice(DAYS),
+                                                 'min_free_time': rng.choice([0, 30, 60])}))
+        elif kind < 0.9:
+            queries.append(('/get_free_room', {'building': building, 'room': room, 'day': rng.choice(DAYS),
+                                               'min_free_time': rng.choice([0, 30, 60])}))
+        else:
+            start = rng.randrange(8 * 60, 20 * 60, 30)
+            queries.append(('/get_free_rooms', {'day': rng.choice(DAYS), 'start': f'{start // 60}:{start % 60:02d}',
+                                                'end': f'{(start + 90) // 60}:{(start + 90) % 60:02d}'}))
+    return queries
+
+
+def start_server(workers):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, API_BIND=f'127.0.0.1:{port}', API_WORKERS=str(workers))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'api:app'],
+                              cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+                return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start, is it installed?')
+
+
+async def client(session, url, queries, offset, deadline, latencies, errors):
+    i = offset
+    while time.perf_counter() < deadline:
+        path, params = queries[i % len(queries)]
+        i += 1
+        start = time.perf_counter()
+        async with session.get(url + path, params=params) as response:
+            await response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(url, concurrency, seconds):
+    queries = query_mix()
+    latencies, errors = [], []
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        # warm-up pass so connection setup isn't measured
+        await client(session, url, queries, 0, time.perf_counter() + 1, [], [])
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session, url, queries, n * 97, start + seconds, latencies, errors)
+                               for n in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f'{concurrency} clients for {elapsed:.1f}s: {len(latencies)} requests, {len(errors)} errors')
+    print(f'throughput {len(latencies) / elapsed:8.1f} req/s')
+    print(f'latency    p50 {latencies[len(latencies) // 2] * 1e3:7.2f} ms  '
+          f'p99 {latencies[int(len(latencies) * 0.99)] * 1e3:7.2f} ms')
+
+
+def main(concurrency=32, seconds=10, workers=None, url=None):
+    server = None
+    if url is None:
+        workers = workers or os.cpu_count() * 2 + 1
+        server, url = start_server(workers)
+        print(f'gunicorn with {workers} workers at {url}')
+    try:
+        asyncio.run(run(url, concurrency, seconds))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 10,
+         int(sys.argv[3]) if len(sys.argv) > 3 else None,
+         sys.argv[4] if len(sys.argv) > 4 else None)
@@ -0,0 +1,122 @@
+# the bot's client for the Flask API: one pooled aiohttp session for every command, a TTL cache of
+# successful responses, and coalescing so identical lookups fired together share one request.
+# expired entries are revalidated with the API's ETag, so an unchanged answer comes back as a 304
+import asyncio
+import json
+import sys
+import time
+
+import aiohttp
+
+import api_path  # puts api/ on sys.path for the services imports
+from services.room_catalog import RoomCatalog
+
+
+class ApiClient:
+    def __init__(self, base_url, ttl=60.0, connection_limit=16):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.connection_limit = connection_limit
+        self.session = None
+
+        self.cache = {}  # key -> (expires at, etag, payload)
+        self.in_flight = {}  # key -> future of the request every caller with that key awaits
+
+        # RoomCatalog built from the last GET /catalog payload, rebuilt only when the payload changes
+        self.room_catalog = None
+        self.catalog_payload = None
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidated = 0
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self.session
+
+    async def get_json(self, path, params):
+        return await self.request('GET', path, params=params)
+
+    async def post_json(self, path, body):
+        return await self.request('POST', path, body=body)
+
+    async def request(self, method, path, params=None, body=None):
+        # returns the decoded JSON of a 200, raises RuntimeError with the API's error message otherwise
+        key = (method, path, json.dumps(params, sort_keys=True), json.dumps(body, sort_keys=True))
+
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[2]
+
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            payload = await self.fetch(key, method, path, params, body, cached)
+            future.set_result(payload)
+            return payload
+        except Exception as e:
+            future.set_exception(e)
+            # mark it retrieved so a failure nobody else waited on isn't logged as unhandled
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # cancelled while fetching, callers coalesced onto it get an error instead of waiting forever
+                future.set_exception(RuntimeError(f'{method} {path} was cancelled'))
+                future.exception()
+            del self.in_flight[key]
+
+    async def fetch(self, key, method, path, params, body, cached):
+        headers = {}
+        if cached is not None and cached[1]:
+            headers['If-None-Match'] = cached[1]
+
+        async with self.get_session().request(method, f'{self.base_url}{path}', params=params, json=body,
+                                              headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                self.revalidated += 1
+                payload = cached[2]
+            elif response.status != 200:
+                try:
+                    error_json = await response.json()
+                    error_message = error_json.get('error', 'Unknown Error')
+                except Exception:
+                    error_message = await response.text()
+                raise RuntimeError(error_message)
+            else:
+                payload = await response.json()
+
+            self.cache[key] = (time.monotonic() + self.ttl, response.headers.get('ETag'), payload)
+            return payload
+
+    async def catalog(self):
+        # within the TTL this is a dict lookup, after it a 304 keeps the built catalog
+        payload = await self.get_json('/catalog', {})
+        if payload is not self.catalog_payload:
+            self.room_catalog = RoomCatalog.from_json(payload)
+            self.catalog_payload = payload
+        return self.room_catalog
+
+    def clear(self):
+        # after a scrape swaps the DB every cached answer may be stale
+        self.cache.clear()
+
+    def stats(self):
+        return {'entries': len(self.cache), 'hits': self.hits, 'misses': self.misses,
+                'coalesced': self.coalesced, 'revalidated': self.revalidated}
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
@@ -0,0 +1,9 @@
+# src/ uses the API's services package (metrics, schema constants, gap finder, query layer).
+# every src module that imports services.* imports this first, so nothing depends on import order.
+# appended rather than prepended, so api/ never shadows anything else on the bot's path
+import os
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+if API_DIR not in sys.path:
+    sys.path.append(API_DIR)
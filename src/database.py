@@ -1,33 +1,116 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import namedtuple
+
 import aiosqlite
 import os
 
+import api_path  # puts api/ on sys.path for the services imports
+from page_parser import PARSER_VERSION
+from scrape_metrics import FLUSH_ROWS, FLUSH_SECONDS
+# the schema constants and gap finder are the API's
+from services.db_constants import SCHEMA_VERSION, VALID_DAYS as DAYS
+from services.schedule_service import find_free_gaps
+
+# both live next to the repo root, which is where the API reads class_time_DB.db from
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMP_DB_PATH = os.path.join(ROOT_DIR, 'temp_DB.db')
+LIVE_DB_PATH = os.path.join(ROOT_DIR, 'class_time_DB.db')
+
+# status change for one (subject, career) unit of a scrape, written in the same transaction as its rows
+UnitStatus = namedtuple('UnitStatus', ['subject', 'subject_name', 'career', 'career_name', 'status', 'row_count'])
+# hash of a unit's normalized result page plus the records parsed from it, reused while the page is unchanged
+PageSnapshot = namedtuple('PageSnapshot', ['subject', 'career', 'page_hash', 'records'])
+
+# a temp_DB.db whose scrape started longer ago than this (seconds) is thrown away instead of resumed,
+# its 'done' units would be too out of date to publish next to freshly scraped ones
+RESUME_MAX_AGE = float(os.getenv('SCRAPE_RESUME_MAX_AGE', str(24 * 3600)))
+
+SCHEMA = [
+    # building names and rooms are interned so every times row is four small integers
+    """
+    CREATE TABLE IF NOT EXISTS buildings (
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS classrooms (
+        id INTEGER PRIMARY KEY,
+        building_id INTEGER REFERENCES buildings(id) ON DELETE CASCADE,
+        floor INTEGER,
+        room TEXT,
+        UNIQUE (building_id, floor, room)
+    )
+    """,
+    # the UNIQUE index already serves (building, floor) lookups, this one serves (building, room).
+    # both are covering for the API queries, see benchmarks/bench_queries.py
+    """
+    CREATE INDEX IF NOT EXISTS classrooms_building_room ON classrooms (building_id, room)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS times (
+        room_id INTEGER REFERENCES classrooms(id) ON DELETE CASCADE,
+        day INTEGER,
+        start_time INTEGER,
+        end_time INTEGER,
+        PRIMARY KEY (room_id, day, start_time, end_time)
+    ) WITHOUT ROWID
+    """,
+    # every free interval of every room and day, built once per scrape by build_free_times.
+    # a (room, day) lookup stays inside its primary key range and length >= ? filters that handful of rows
+    """
+    CREATE TABLE IF NOT EXISTS free_times (
+        room_id INTEGER REFERENCES classrooms(id) ON DELETE CASCADE,
+        day INTEGER,
+        start_time INTEGER,
+        end_time INTEGER,
+        length INTEGER,
+        PRIMARY KEY (room_id, day, start_time)
+    ) WITHOUT ROWID
+    """,
+    # one row per (subject, career) search so a failed scrape can resume where it stopped
+    """
+    CREATE TABLE IF NOT EXISTS scrape_manifest (
+        subject TEXT,
+        subject_name TEXT,
+        career TEXT,
+        career_name TEXT,
+        status TEXT DEFAULT 'pending',
+        row_count INTEGER DEFAULT 0,
+        PRIMARY KEY (subject, career)
+    )
+    """,
+    # generation marker bumped on every swap so readers and caches can tell snapshots apart
+    """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS scrape_pages (
+        subject TEXT,
+        career TEXT,
+        page_hash TEXT,
+        records TEXT,
+        PRIMARY KEY (subject, career)
+    )
+    """,
+    f"INSERT OR IGNORE INTO meta VALUES ('schema_version', {SCHEMA_VERSION})",
+]
+
 async def get_temp_connection():
-    conn = await aiosqlite.connect('temp_DB.db')
+    conn = await aiosqlite.connect(TEMP_DB_PATH)
     return conn
 
 async def initialize_tables(conn):
     try:
         async with conn.cursor() as cursor:
-            await cursor.execute("""
-                CREATE TABLE IF NOT EXISTS classrooms (
-                    building TEXT,
-                    floor INTEGER,
-                    room TEXT,
-                    PRIMARY KEY (building, floor, room)
-                )
-            """)
-
-            await cursor.execute("""
-                CREATE TABLE IF NOT EXISTS times (
-                    building TEXT REFERENCES classrooms(building) ON DELETE CASCADE,
-                    floor INTEGER REFERENCES classrooms(floor) ON DELETE CASCADE,
-                    room TEXT REFERENCES classrooms(room) ON DELETE CASCADE,
-                    day TEXT,
-                    start_time text,
-                    end_time text,
-                    PRIMARY KEY (building, floor, room, day, start_time, end_time)
-                )
-            """)
+            for statement in SCHEMA:
+                await cursor.execute(statement)
 
             await conn.commit()
             print("Database sucessfully initialized.")
@@ -35,40 +118,294 @@ async def initialize_tables(conn):
     except Exception as e:
         print(f"Error occurred while initializing database: {e}")
 
-async def insertRoom(conn, building_tuple):
-    # Classroom (building, floor, room #)
+def discard_stale_temp_DB(db_path, term):
+    # a resume only makes sense for the same term, parser and a recent enough scrape, anything else starts over
+    if not os.path.exists(db_path):
+        return
+    age = time.time() - read_meta(db_path, 'scrape_started')
+    if (read_meta(db_path, 'term') == int(term) and read_meta(db_path, 'parser_version') == PARSER_VERSION
+            and age < RESUME_MAX_AGE):
+        return
+    print(f"Discarding {db_path}, it's from another term or parser version, "
+          f"or older than {RESUME_MAX_AGE / 3600:g} hours.")
+    for path in (db_path, db_path + '-journal', db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+async def record_scrape_start(conn, term):
+    # kept from the first run through every resume, see discard_stale_temp_DB
+    await conn.executemany('INSERT OR IGNORE INTO meta VALUES (?, ?)',
+                           [('term', int(term)), ('scrape_started', int(time.time())),
+                            ('parser_version', PARSER_VERSION)])
+    await conn.commit()
+
+async def seed_manifest(conn, units):
+    # units are ((subject name, subject code), career name, career code), already finished units are kept.
+    # units that aren't in this list anymore are dropped, scrape_complete only counts the current ones
+    keys = [(major[1], code) for major, _, code in units]
+    async with conn.execute('SELECT subject, career FROM scrape_manifest') as cursor:
+        stale = set(await cursor.fetchall()) - set(keys)
+    await conn.executemany('DELETE FROM scrape_manifest WHERE subject = ? AND career = ?', stale)
+    await conn.executemany(
+        'INSERT OR IGNORE INTO scrape_manifest (subject, subject_name, career, career_name) VALUES (?, ?, ?, ?)',
+        [(major[1], major[0], code, level) for major, level, code in units]
+    )
+    await conn.commit()
+    if stale:
+        print(f"Dropped {len(stale)} units from the manifest that Global Search no longer lists.")
+
+async def finished_units(conn):
+    async with conn.execute("SELECT subject, career FROM scrape_manifest WHERE status = 'done'") as cursor:
+        return set(await cursor.fetchall())
+
+async def scrape_complete(conn):
+    # only a scrape where every unit succeeded may replace the live DB
+    async with conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(status = 'done'), 0)
+        FROM scrape_manifest
+    """) as cursor:
+        total, done = await cursor.fetchone()
+    return total > 0 and total == done
+
+async def build_free_times(conn):
+    # rooms without classes on a day get the whole day, same as the API used to compute per request
+    async with conn.execute('SELECT id FROM classrooms') as cursor:
+        room_ids = [room_id for (room_id,) in await cursor.fetchall()]
+    async with conn.execute('SELECT room_id, day, start_time, end_time FROM times') as cursor:
+        times = await cursor.fetchall()
+
+    # one find_free_gaps key per (room, day), so the whole campus is a single batch
+    slot_of = {room_id: slot for slot, room_id in enumerate(room_ids)}
+    gap_slots, gap_starts, gap_ends = find_free_gaps(
+        [slot_of[room_id] * len(DAYS) + day for room_id, day, _, _ in times],
+        [start for _, _, start, _ in times], [end for _, _, _, end in times], len(room_ids) * len(DAYS))
+    rows = [
+        (room_ids[slot // len(DAYS)], slot % len(DAYS), start, end, end - start)
+        for slot, start, end in zip(gap_slots.tolist(), gap_starts.tolist(), gap_ends.tolist())
+    ]
+
+    await conn.execute('DELETE FROM free_times')
+    await conn.executemany('INSERT INTO free_times VALUES (?, ?, ?, ?, ?)', rows)
+    await conn.commit()
+    print(f"Built {len(rows)} free intervals for {len(room_ids)} rooms.")
+
+async def load_page_snapshots(db_path=LIVE_DB_PATH):
+    # {(subject, career): (page hash, records json)} from the last finished scrape, empty if there is none
+    if not os.path.exists(db_path) or read_meta(db_path, 'schema_version') != SCHEMA_VERSION:
+        # records saved under another schema can't be reused as they are
+        return {}
+    if read_meta(db_path, 'parser_version') != PARSER_VERSION:
+        # parsed by an older page_parser, every page goes through the current one again
+        print(f"Page snapshots in {db_path} are from another parser version, parsing every unit again.")
+        return {}
     try:
-        await conn.execute(
-            'INSERT OR REPLACE INTO classrooms VALUES (?, ?, ?)', building_tuple
-        )
-        await conn.commit()
+        async with aiosqlite.connect(db_path) as conn:
+            async with conn.execute('SELECT subject, career, page_hash, records FROM scrape_pages') as cursor:
+                return {(subject, career): (page_hash, records) for subject, career, page_hash, records in await cursor.fetchall()}
     except Exception as e:
-        print(f'DB error occurred while attempting to add classroom info {building_tuple}: {e}')
+        print(f"No page hashes found in {db_path}, scraping every unit in full: {e}")
+        return {}
 
-async def insertTime(conn, building_tuple, date_time_tuple):
-    # Times (classroom tuple + day + start time + end time)
+def read_meta(db_path, key):
+    conn = sqlite3.connect(db_path)
     try:
-        await conn.execute(
-            'INSERT OR REPLACE INTO times VALUES (?, ?, ?, ?, ?, ?)',
-            building_tuple + date_time_tuple
-        )
-        await conn.commit()
-    except Exception as e:
-        print(f'DB error occurred while attempting to add date and time info {date_time_tuple}: {e}')
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else 0
+    except sqlite3.Error:
+        # no meta table in databases from before generation markers
+        return 0
+    finally:
+        conn.close()
+
+def read_generation(db_path):
+    return read_meta(db_path, 'generation')
 
 def over_write_old_DB():
-    old_name = 'temp_DB.db'
-    new_name = 'class_time_DB.db'
+    old_name = TEMP_DB_PATH
+    new_name = LIVE_DB_PATH
 
     # Check if the old database (temp) exists
     if os.path.exists(old_name):
-        # If the new database already exists, remove it before renaming
-        if os.path.exists(new_name):
-            os.remove(new_name)
-            print(f"Existing {new_name} removed.")
-
-        # Now safely rename the file
-        os.rename(old_name, new_name)
-        print(f"Database renamed from {old_name} to {new_name}.")
+        generation = (read_generation(new_name) if os.path.exists(new_name) else 0) + 1
+        conn = sqlite3.connect(old_name)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (generation,))
+        conn.close()
+
+        # os.replace swaps the file in one step, so the API never sees a missing DB.
+        # readers that already opened the old file keep reading that snapshot until they close it
+        os.replace(old_name, new_name)
+        print(f"Database renamed from {old_name} to {new_name} (generation {generation}).")
     else:
-        print(f"{old_name} does not exist.")
\ No newline at end of file
+        print(f"{old_name} does not exist.")
+
+
+class DBWriter:
+    """
+    Long-lived writer that drains scraped meeting rows from a queue and flushes
+    them with executemany, one transaction per batch, over a single connection.
+    """
+
+    def __init__(self, db_path=TEMP_DB_PATH, batch_size=1000, flush_interval=1.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.conn = None
+        # bounded so a fast scrape waits on the writer instead of buffering the whole term
+        self.queue = asyncio.Queue(maxsize=batch_size * 4)
+        self.rows_written = 0
+        self._task = None
+        # set by the first failed flush. Its rows are gone and nothing says which units they belonged to,
+        # so from then on no unit is committed as 'done' and the scrape can't count as complete
+        self.flush_failed = False
+
+        # interned ids, building name -> id and (building, floor, room #) -> id
+        self.building_ids = {}
+        self.room_ids = {}
+
+    async def start(self):
+        self.conn = await aiosqlite.connect(self.db_path)
+        await initialize_tables(self.conn)
+        await self._load_ids()
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, building_tuple, date_time_tuple):
+        # (building, floor, room #) + (day index, start minute, end minute)
+        await self.queue.put(building_tuple + date_time_tuple)
+
+    async def mark_unit(self, major, career_name, career, status, row_count=0):
+        # queued behind the unit's rows, so 'done' is never committed before the rows are.
+        # after a failed flush it's committed as 'failed' instead, see _flush
+        await self.queue.put(UnitStatus(major[1], major[0], career, career_name, status, row_count))
+
+    async def save_page(self, major, career, page_hash, records):
+        await self.queue.put(PageSnapshot(major[1], career, page_hash, json.dumps(records)))
+
+    @property
+    def started(self):
+        return self._task is not None
+
+    async def flush(self):
+        # waits until everything queued so far is committed
+        flushed = asyncio.Event()
+        await self.queue.put(flushed)
+        await flushed.wait()
+
+    async def close(self):
+        # also fine on a writer whose start() didn't get to the end
+        if self._task is not None:
+            await self.queue.put(None)
+            await self._task
+        if self.conn is not None:
+            await self.conn.close()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        statuses = []
+        pages = []
+        waiters = []
+        last_flush = loop.time()
+
+        while True:
+            try:
+                record = await asyncio.wait_for(self.queue.get(), self.flush_interval)
+            except asyncio.TimeoutError:
+                record = ()
+
+            # drain whatever is already queued without waiting again
+            while record:
+                if isinstance(record, UnitStatus):
+                    statuses.append(record)
+                elif isinstance(record, PageSnapshot):
+                    pages.append(record)
+                elif isinstance(record, asyncio.Event):
+                    waiters.append(record)
+                    break
+                else:
+                    batch.append(record)
+                if len(batch) >= self.batch_size or self.queue.empty():
+                    break
+                record = self.queue.get_nowait()
+
+            if waiters or (batch or statuses or pages) and (record is None or len(batch) >= self.batch_size
+                                                            or loop.time() - last_flush >= self.flush_interval):
+                await self._flush(batch, statuses, pages)
+                batch = []
+                statuses = []
+                pages = []
+                last_flush = loop.time()
+
+            for flushed in waiters:
+                flushed.set()
+            waiters = []
+
+            # None tells the writer loop to stop
+            if record is None:
+                return
+
+    async def _flush(self, batch, statuses=(), pages=()):
+        if not batch and not statuses and not pages:
+            return
+        if self.flush_failed:
+            # the next resume scrapes these units again, INSERT OR IGNORE skips the rows that did make it
+            statuses = [status._replace(status='failed') if status.status == 'done' else status
+                        for status in statuses]
+        try:
+            started = time.perf_counter()
+            await self._intern(batch)
+            await self.conn.executemany(
+                'INSERT OR IGNORE INTO times VALUES (?, ?, ?, ?)',
+                [(self.room_ids[record[:3]],) + record[3:] for record in batch]
+            )
+            await self.conn.executemany(
+                'INSERT OR REPLACE INTO scrape_manifest VALUES (?, ?, ?, ?, ?, ?)', statuses
+            )
+            await self.conn.executemany(
+                'INSERT OR REPLACE INTO scrape_pages VALUES (?, ?, ?, ?)', pages
+            )
+            await self.conn.commit()
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            FLUSH_ROWS.observe(len(batch))
+            self.rows_written += len(batch)
+        except Exception as e:
+            await self.conn.rollback()
+            self.flush_failed = True
+            # ids handed out inside the failed transaction are gone too
+            await self._load_ids()
+            print(f'DB error occurred while flushing {len(batch)} rows, the scrape will end incomplete: {e}')
+            # statuses in this batch were rolled back with it and stay 'pending', try to record them as failed
+            failed = [status._replace(status='failed') for status in statuses]
+            if failed:
+                try:
+                    await self.conn.executemany('INSERT OR REPLACE INTO scrape_manifest VALUES (?, ?, ?, ?, ?, ?)', failed)
+                    await self.conn.commit()
+                except Exception:
+                    await self.conn.rollback()
+
+    async def _intern(self, batch):
+        # only buildings and rooms this writer hasn't seen yet cost a round trip
+        new_buildings = {record[0] for record in batch} - self.building_ids.keys()
+        if new_buildings:
+            await self.conn.executemany(
+                'INSERT OR IGNORE INTO buildings (name) VALUES (?)', [(building,) for building in new_buildings]
+            )
+            await self._load_ids()
+
+        new_rooms = {record[:3] for record in batch} - self.room_ids.keys()
+        if new_rooms:
+            await self.conn.executemany(
+                'INSERT OR IGNORE INTO classrooms (building_id, floor, room) VALUES (?, ?, ?)',
+                [(self.building_ids[building], floor, room) for building, floor, room in new_rooms]
+            )
+            await self._load_ids()
+
+    async def _load_ids(self):
+        async with self.conn.execute('SELECT name, id FROM buildings') as cursor:
+            self.building_ids = dict(await cursor.fetchall())
+        async with self.conn.execute("""
+            SELECT b.name, c.floor, c.room, c.id
+            FROM classrooms c JOIN buildings b ON b.id = c.building_id
+        """) as cursor:
+            self.room_ids = {(building, floor, room): room_id for building, floor, room, room_id in await cursor.fetchall()}
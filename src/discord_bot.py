@@ -1,6 +1,5 @@
 import enum
 
-import aiohttp
 import logging
 import os
 import platform
@@ -13,33 +12,16 @@ from colorama import Back, Fore, Style
 from discord.ext import commands
 from dotenv import load_dotenv
 from discord import app_commands
-from database import get_temp_connection, initialize_tables, over_write_old_DB
-from scraper import Scraper
+import api_path  # puts api/ on sys.path for the services imports
+from api_client import ApiClient
+from database import LIVE_DB_PATH
+from scrape_job import ScrapeJob
+from scrape_metrics import start_writer
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-class ValidBuildings(enum.Enum):
-    Campbell = "campbell"
-    Colwin = "colwin"
-    Delany = "delany"
-    G_Building = "g building"
-    Gymnasium = "gymnasium"
-    Honors = "honors"
-    I_Building = "i building"
-    Kiely_Hall = "kiely hall"
-    King_Hall = "king hall"
-    Kissena = "kissena"
-    Klapper = "klapper"
-    Music = "music"
-    Powdermker = "powdermker"
-    Queenshall = "queenshall"
-    Rathaus = "rathaus"
-    Remsen = "remsen"
-    Rosenthal = "rosenthal"
-    Science = "science"
-
 class ValidDays(enum.Enum):
     Mo = "mo"
     Tu = "tu"
@@ -52,8 +34,41 @@ class ValidDays(enum.Enum):
 ADMIN_IDS = os.getenv("ADMIN_IDS", "").split(",")
 ADMIN_IDS = [int(admin_id) for admin_id in ADMIN_IDS]
 API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:5000')
-
-client = commands.Bot(command_prefix='%', intents=discord.Intents.all())
+SCRAPE_WORKERS = int(os.getenv('SCRAPE_WORKERS', '4'))
+SCRAPE_REQUESTS_PER_SECOND = float(os.getenv('SCRAPE_REQUESTS_PER_SECOND', '2'))
+SCRAPE_CONNECTION_LIMIT = int(os.getenv('SCRAPE_CONNECTION_LIMIT', '8'))
+# seconds between progress edits of the /scrape reply
+SCRAPE_PROGRESS_INTERVAL = float(os.getenv('SCRAPE_PROGRESS_INTERVAL', '10'))
+# profile every scrape, /scrape profile:True does it for one
+SCRAPE_PROFILE = os.getenv('SCRAPE_PROFILE') == '1'
+API_CACHE_TTL = float(os.getenv('API_CACHE_TTL', '60'))
+# room left in an embed's 6000 character budget for its footer
+EMBED_FOOTER_RESERVE = 100
+# 'http' goes through the Flask API at API_BASE_URL, 'embedded' runs the API's query layer inside the bot
+QUERY_MODE = os.getenv('QUERY_MODE', 'http')
+
+if QUERY_MODE == 'embedded':
+    from embedded_client import EmbeddedClient
+    api_client = EmbeddedClient(LIVE_DB_PATH, engine=os.getenv('QUERY_ENGINE', 'memory'))
+else:
+    api_client = ApiClient(API_BASE_URL, ttl=API_CACHE_TTL)
+
+# lookups answered before a swap are stale afterwards
+scrape_job = ScrapeJob(workers=SCRAPE_WORKERS, requests_per_second=SCRAPE_REQUESTS_PER_SECOND,
+                       connection_limit=SCRAPE_CONNECTION_LIMIT, on_swap=api_client.clear)
+
+# scrape metrics (and embedded lookups) reach the API's /metrics through METRICS_DIR
+start_writer()
+
+class ClassroomBot(commands.Bot):
+    async def close(self):
+        # let a running scrape flush what it has, the next one resumes from there
+        if scrape_job.cancel():
+            await scrape_job.wait()
+        await api_client.close()
+        await super().close()
+
+client = ClassroomBot(command_prefix='%', intents=discord.Intents.all())
 def is_admin():
     async def predicate(interaction: discord.Interaction):
         if interaction.user.id not in ADMIN_IDS:
@@ -81,33 +96,42 @@ async def on_app_command_error(interaction: discord.Interaction, error):
             await interaction.response.send_message("⚠ An unexpected error occurred.", ephemeral=True)
 
 
-async def perform_scrape():
-    print("Starting to scrape...this may take a moment.")
-    start_time = time.time()
-    scraper = Scraper()
-
-    conn = await get_temp_connection()
-    await initialize_tables(conn)
-    try:
-        majors_list = await scraper.get_majors()
-        await scraper.scrape_all_schedules(majors_list)
-        print("Scraping complete! Data has been saved to the database.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-    finally:
-        await conn.close()
-        over_write_old_DB()
-
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-    print(f"Scraping completed in {elapsed_time:.2f} seconds.")
-
 @client.tree.command(name="scrape", description="Scrape Global Search and Update DB")
 @is_admin()
-async def scrape(interaction: discord.Interaction):
+@app_commands.describe(profile="Save a cProfile of the whole scrape to the bot's profiles folder")
+async def scrape(interaction: discord.Interaction, profile: bool = False):
+    if not scrape_job.start(profile=profile or SCRAPE_PROFILE):
+        await interaction.response.send_message(f"A scrape is already running. {scrape_job.status()}", ephemeral=True)
+        return
     await interaction.response.send_message('Starting to scrape...this may take a moment.')
-    await perform_scrape()  # Call the separate scraping function
-    await interaction.followup.send("Scraping completed.")
+
+    # the scrape runs in the background, this only keeps the reply up to date.
+    # interaction tokens expire after 15 minutes, /scrape_status works after that
+    expires = time.monotonic() + 14 * 60
+    while not await scrape_job.wait(SCRAPE_PROGRESS_INTERVAL) and time.monotonic() < expires:
+        try:
+            await interaction.edit_original_response(content=scrape_job.status())
+        except discord.HTTPException:
+            return
+    if not scrape_job.running:
+        try:
+            await interaction.edit_original_response(content=scrape_job.status())
+        except discord.HTTPException:
+            pass
+
+@client.tree.command(name="scrape_status", description="Progress of the running or last scrape")
+@is_admin()
+async def scrape_status(interaction: discord.Interaction):
+    await interaction.response.send_message(scrape_job.status(), ephemeral=True)
+
+@client.tree.command(name="scrape_cancel", description="Stop the running scrape, the next /scrape resumes it")
+@is_admin()
+async def scrape_cancel(interaction: discord.Interaction):
+    if scrape_job.cancel():
+        await interaction.response.send_message("Cancelling the scrape, finished units are kept for the next run.",
+                                                ephemeral=True)
+    else:
+        await interaction.response.send_message(f"Nothing to cancel. {scrape_job.status()}", ephemeral=True)
 
 def parse_time_input(time_str: str) -> int:
     """
@@ -127,8 +151,63 @@ def parse_time_input(time_str: str) -> int:
     return hours * 60 + minutes
 
 
+def parse_clock_input(time_str: str) -> str:
+    """
+    Converts a time of day like '2pm', '2:30pm', '14:30' or 'now' into the API's 'HH:MM' format.
+    """
+    time_str = time_str.lower().replace(" ", "")
+    if time_str == 'now':
+        return datetime.now().strftime("%H:%M")
+
+    for time_format in ("%I%p", "%I:%M%p", "%H:%M", "%H"):
+        try:
+            return datetime.strptime(time_str, time_format).strftime("%H:%M")
+        except ValueError:
+            pass
+    raise ValueError("Invalid time. Use formats like '2pm', '2:30pm', '14:30' or 'now'.")
+
+
+async def building_autocomplete(interaction: discord.Interaction, current: str):
+    try:
+        catalog = await api_client.catalog()
+    except Exception:
+        return []
+    return [app_commands.Choice(name=building.title(), value=building) for building in catalog.complete_buildings(current)]
+
+
+async def room_autocomplete(interaction: discord.Interaction, current: str):
+    # narrowed to the building already picked in the same command
+    building = str(interaction.namespace.building or '').strip().lower()
+    try:
+        catalog = await api_client.catalog()
+    except Exception:
+        return []
+    return [app_commands.Choice(name=room.upper(), value=room) for room in catalog.complete_rooms(building, current)]
+
+
+async def floor_autocomplete(interaction: discord.Interaction, current: str):
+    building = str(interaction.namespace.building or '').strip().lower()
+    try:
+        catalog = await api_client.catalog()
+    except Exception:
+        return []
+    return [app_commands.Choice(name=str(floor), value=floor) for floor in catalog.complete_floors(building)
+            if str(floor).startswith(str(current or ''))]
+
+
+async def check_place(building, room=None):
+    # a typo is caught against the catalog, without a lookup. Returns the message to send, or None
+    catalog = await api_client.catalog()
+    if not catalog.has_building(building):
+        return f"Unknown building {building.title()}. Pick one of: {', '.join(name.title() for name in catalog.buildings)}."
+    if room is not None and not catalog.has_room(building, room.lower()):
+        return f"Room {room.upper()} does not exist in building {building.title()}."
+    return None
+
+
 @client.tree.command(name="get_floor_times", description="Get free times for any floor in any building")
-async def free_floors(interaction: discord.Interaction, building: ValidBuildings, floor: int, day: ValidDays, min_free_time: str = '30m'):
+@app_commands.autocomplete(building=building_autocomplete, floor=floor_autocomplete)
+async def free_floors(interaction: discord.Interaction, building: str, floor: int, day: ValidDays, min_free_time: str = '30m'):
 
     try:
         min_free_time = parse_time_input(min_free_time)
@@ -136,46 +215,40 @@ async def free_floors(interaction: discord.Interaction, building: ValidBuildings
         await interaction.response.send_message(str(e))
 
     try:
-        async with aiohttp.ClientSession() as session:
-            params = {
-                'building': building.value,
-                'floor': floor,
-                'day': day.value,
-                'min_free_time': min_free_time
-            }
-            async with session.get(f'{API_BASE_URL}/get_free_floors', params=params) as response:
-                if response.status != 200:
-                    try:
-                        error_json = await response.json()
-                        error_message = await error_json.get('error', 'Unknown Error')
-                    except Exception:
-                        error_message = await response.text()
-                    raise RuntimeError(error_message)
-
-                free_slots = await response.json()
-
-                if free_slots:
-                    print(f"Success on finding classes for {building.name, floor, day.name}: {free_slots}")
-
-                    embed = discord.Embed(
-                        title=f"Free Times for {building.value.title()} Floor {floor} on {day.name}",
-                        color=discord.Color.blue()
-                    )
-
-                    for room in sorted(free_slots):
-                        # Convert each time slot to standard AM/PM format
-                        converted_times = [
-                            f"{convert_to_standard_time(start)} - {convert_to_standard_time(end)}"
-                            for start, end in (time_slot.split(" - ") for time_slot in free_slots[room])
-                        ]
-                        embed.add_field(name=f"Room {room}", value='\n'.join(converted_times), inline=False)
-
-                    await interaction.response.send_message(embed=embed)
-
-                else:
-                    await interaction.response.send_message(
-                        f"No free times found for {building.value.title()} floor {floor} on {day.name}."
-                    )
+        building = building.strip().lower()
+        problem = await check_place(building)
+        if problem:
+            await interaction.response.send_message(problem)
+            return
+
+        params = {
+            'building': building,
+            'floor': floor,
+            'day': day.value,
+            'min_free_time': min_free_time
+        }
+        free_slots = await api_client.get_json('/get_free_floors', params)
+
+        if free_slots:
+            embed = discord.Embed(
+                title=f"Free Times for {building.title()} Floor {floor} on {day.name}",
+                color=discord.Color.blue()
+            )
+
+            for room in sorted(free_slots):
+                # Convert each time slot to standard AM/PM format
+                converted_times = [
+                    f"{convert_to_standard_time(start)} - {convert_to_standard_time(end)}"
+                    for start, end in (time_slot.split(" - ") for time_slot in free_slots[room])
+                ]
+                embed.add_field(name=f"Room {room}", value='\n'.join(converted_times), inline=False)
+
+            await interaction.response.send_message(embed=embed)
+
+        else:
+            await interaction.response.send_message(
+                f"No free times found for {building.title()} floor {floor} on {day.name}."
+            )
     except Exception as e:
         await interaction.response.send_message(f"An error occurred: {str(e)}")
 
@@ -189,13 +262,17 @@ async def help(interaction: discord.Interaction):
     
     embed.add_field(
         name="📅 Commands",
-        value="`/get_floor_times` - Schedule for entire floor\n`/get_room_time` - Schedule for specific room",
+        value="`/get_floor_times` - Schedule for entire floor\n`/get_room_time` - Schedule for specific room\n`/get_room_week` - Week schedule for specific room\n`/get_free_rooms` - Rooms free between two times anywhere on campus",
         inline=False
     )
     
+    try:
+        buildings = ", ".join(building.title() for building in (await api_client.catalog()).buildings)
+    except Exception:
+        buildings = "Unavailable until the first scrape finishes"
     embed.add_field(
         name="🏢 Buildings",
-        value="Campbell, Colwin, Delany, G Building, Gymnasium, Honors, I Building, Kiely Hall, King Hall, Kissena, Klapper, Music, Powdermker, QueensHall, Rathaus, Remsen, Rosenthal, Science",
+        value=buildings,
         inline=False
     )
     
@@ -208,7 +285,8 @@ async def help(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed)
 
 @client.tree.command(name="get_room_time", description="Get free times for any individual room in any building")
-async def free_room(interaction: discord.Interaction, building: ValidBuildings, room: str, day: ValidDays, min_free_time : str = '30m'):
+@app_commands.autocomplete(building=building_autocomplete, room=room_autocomplete)
+async def free_room(interaction: discord.Interaction, building: str, room: str, day: ValidDays, min_free_time : str = '30m'):
 
     try:
         min_free_time = parse_time_input(min_free_time)
@@ -217,45 +295,152 @@ async def free_room(interaction: discord.Interaction, building: ValidBuildings,
         return
 
     try:
+        building = building.strip().lower()
+        problem = await check_place(building, room)
+        if problem:
+            await interaction.response.send_message(problem)
+            return
+
+        params = {
+            'building': building,
+            'room': room,
+            'day': day.value,
+            'min_free_time': min_free_time
+        }
+        free_slots = await api_client.get_json('/get_free_room', params)
+
+        if free_slots:
+            embed = discord.Embed(
+                title=f"Free Times for {building.title()} {room.upper()} on {day.name}",
+                color=discord.Color.blue()
+            )
+
+            # Convert each time slot to standard AM/PM format
+            converted_slots = [
+                f"{convert_to_standard_time(start)} - {convert_to_standard_time(end)}"
+                for start, end in (slot.split(" - ") for slot in free_slots)
+            ]
+
+            embed.add_field(name='Available Times', value= "\n".join(converted_slots))
+            await interaction.response.send_message(embed=embed)
+        else:
+            await interaction.response.send_message(f"""Couldn't find free time for this room with this minimum time. Either the room number is wrong or the room is completly free today!""")
+
+    except Exception as e:
+        await interaction.response.send_message(f"An error occurred: {str(e)}")
+
+@client.tree.command(name="get_room_week", description="Get free times for a room on every day of the week")
+@app_commands.autocomplete(building=building_autocomplete, room=room_autocomplete)
+async def room_week(interaction: discord.Interaction, building: str, room: str, min_free_time: str = '30m'):
 
-        async with aiohttp.ClientSession() as session:
-            params = {
-                'building': building.value,
-                'room': room,
-                'day': day.value,
-                'min_free_time': min_free_time
-            }
-            async with session.get(f'{API_BASE_URL}/get_free_room', params=params) as response:
-                if response.status != 200:
-                    try:
-                        error_json = await response.json()
-                        error_message = await error_json.get('error', 'Unknown Error')
-                    except Exception:
-                        error_message = await response.text()
-                    raise RuntimeError(error_message)
-
-                free_slots = await response.json()
-
-                if free_slots:
-                    print(f"Success on finding classes for {building.name, room.upper(), day.name}: {free_slots}")
-
-                    embed = discord.Embed(
-                        title=f"Free Times for {building.value.title()} {room.upper()} on {day.name}",
-                        color=discord.Color.blue()
-                    )
-
-                    # Convert each time slot to standard AM/PM format
-                    converted_slots = [
-                        f"{convert_to_standard_time(start)} - {convert_to_standard_time(end)}"
-                        for start, end in (slot.split(" - ") for slot in free_slots)
-                    ]
-                    print(converted_slots)
-
-                    embed.add_field(name='Available Times', value= "\n".join(converted_slots))
-                    await interaction.response.send_message(embed=embed)
-                else:
-                    await interaction.response.send_message(f"""Couldn't find free time for this room with this minimum time. Either the room number is wrong or the room is completly free today!""")
+    try:
+        min_free_time = parse_time_input(min_free_time)
+    except ValueError as e:
+        await interaction.response.send_message(str(e))
+        return
 
+    try:
+        building = building.strip().lower()
+        problem = await check_place(building, room)
+        if problem:
+            await interaction.response.send_message(problem)
+            return
+
+        # one POST /batch for all seven days instead of a GET per day
+        queries = [
+            {'id': day.value, 'building': building, 'room': room, 'day': day.value, 'min_free_time': min_free_time}
+            for day in ValidDays
+        ]
+        week = await api_client.post_json('/batch', {'queries': queries})
+
+        first_day = week[ValidDays.Mo.value]
+        if isinstance(first_day, dict) and 'error' in first_day:
+            raise RuntimeError(first_day['error'])
+
+        embed = discord.Embed(
+            title=f"Free Times for {building.title()} {room.upper()} This Week",
+            color=discord.Color.blue()
+        )
+        for day in ValidDays:
+            converted_slots = [
+                f"{convert_to_standard_time(start)} - {convert_to_standard_time(end)}"
+                for start, end in (slot.split(" - ") for slot in week[day.value])
+            ]
+            embed.add_field(name=day.name, value="\n".join(converted_slots) or "No free time", inline=True)
+
+        await interaction.response.send_message(embed=embed)
+
+    except Exception as e:
+        await interaction.response.send_message(f"An error occurred: {str(e)}")
+
+@client.tree.command(name="get_free_rooms", description="Find rooms anywhere on campus that are free between two times")
+@app_commands.autocomplete(building=building_autocomplete, floor=floor_autocomplete)
+async def free_rooms(interaction: discord.Interaction, day: ValidDays, start: str, end: str, building: str = None,
+                     floor: int = None, min_free_time: str = '0m'):
+
+    try:
+        start = parse_clock_input(start)
+        end = parse_clock_input(end)
+        min_free_time = parse_time_input(min_free_time)
+    except ValueError as e:
+        await interaction.response.send_message(str(e))
+        return
+
+    try:
+        params = {
+            'day': day.value,
+            'start': start,
+            'end': end,
+            'min_free_time': min_free_time
+        }
+        if building is not None:
+            building = building.strip().lower()
+            problem = await check_place(building)
+            if problem:
+                await interaction.response.send_message(problem)
+                return
+            params['building'] = building
+        if floor is not None:
+            params['floor'] = floor
+        free_buildings = await api_client.get_json('/get_free_rooms', params)
+
+        if free_buildings:
+            embed = discord.Embed(
+                title=f"Rooms Free From {convert_to_standard_time(start)} to {convert_to_standard_time(end)} on {day.name}",
+                color=discord.Color.blue()
+            )
+
+            # discord caps embeds at 25 fields of 1024 characters and 6000 characters in total,
+            # title and footer included. Buildings that don't fit are counted in the footer
+            buildings = sorted(free_buildings)
+            total = len(embed.title) + EMBED_FOOTER_RESERVE
+            shown = 0
+            for building_name in buildings[:25]:
+                rooms = free_buildings[building_name]
+                lines = [
+                    f"{room.upper()}: {convert_to_standard_time(free_from)} - {convert_to_standard_time(free_until)}"
+                    for room, (free_from, free_until) in sorted(
+                        (room, free_stretch.split(" - ")) for room, free_stretch in rooms.items())
+                ]
+                value = '\n'.join(lines)
+                if len(value) > 1024:
+                    value = value[:value.rfind("\n", 0, 1000)] + "\n...and more"
+                name = f"{building_name.title()} ({len(rooms)} rooms)"
+                if total + len(name) + len(value) > 6000:
+                    break
+                total += len(name) + len(value)
+                embed.add_field(name=name, value=value, inline=False)
+                shown += 1
+
+            if shown < len(buildings):
+                embed.set_footer(text=f"{len(buildings) - shown} more buildings not shown, "
+                                      f"pick a building to see them.")
+
+            await interaction.response.send_message(embed=embed)
+        else:
+            await interaction.response.send_message(
+                f"No rooms are free from {convert_to_standard_time(start)} to {convert_to_standard_time(end)} on {day.name}."
+            )
     except Exception as e:
         await interaction.response.send_message(f"An error occurred: {str(e)}")
 
@@ -282,10 +467,11 @@ async def on_ready():
     except Exception as e:
         print(f"Failed to sync commands: {e}")
 
-    if os.path.exists('../class_time_DB.db'):
+    if os.path.exists(LIVE_DB_PATH):
         print('DB Exists')
     else:
-        await perform_scrape()
+        # in the background so the bot comes up right away, lookups fail until the first scrape lands
+        scrape_job.start(profile=SCRAPE_PROFILE)
 
 
 
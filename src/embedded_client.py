@@ -0,0 +1,70 @@
+# QUERY_MODE=embedded: the bot answers lookups with the API's own query layer in-process instead of
+# a localhost HTTP round trip. Same interface as ApiClient, so the commands don't care which one they get.
+# the in-memory engine answers from indexes in microseconds, so lookups run inline on the event loop;
+# anything that has to touch SQLite (a reload after a DB swap, or the sqlite engine) runs in a thread
+import asyncio
+
+import api_path  # puts api/ on sys.path for the services imports
+from services.database_service import DatabaseService
+from services.query_service import QueryError, QueryService
+from services.schedule_service import ScheduleService
+
+
+class EmbeddedClient:
+    def __init__(self, db_path=None, engine='memory'):
+        self.db_service = DatabaseService(db_path, engine=engine)
+        self.query_service = QueryService(self.db_service, ScheduleService())
+        self.handlers = {
+            '/get_free_floors': self.query_service.get_free_floors,
+            '/get_free_room': self.query_service.get_free_room,
+            '/get_free_rooms': self.query_service.get_free_rooms,
+            '/catalog': self.query_service.get_catalog,
+        }
+        self.warming = None
+
+        self.inline = 0
+        self.threaded = 0
+
+    async def get_json(self, path, params):
+        handler = self.handlers[path]
+        return await self.run(lambda: handler(params)[1]())
+
+    async def post_json(self, path, body):
+        if path != '/batch':
+            raise KeyError(path)
+        return await self.run(lambda: self.query_service.batch(body))
+
+    async def catalog(self):
+        # the RoomCatalog itself, reloaded with the other indexes when the DB is swapped
+        return await self.run(self.db_service.room_catalog)
+
+    async def run(self, call):
+        # raises RuntimeError with the error message, like ApiClient does for a 400
+        try:
+            indexes = self.db_service.ready_indexes()
+            if indexes is not None:
+                self.inline += 1
+                with self.db_service.pinned(indexes):
+                    return call()
+            self.threaded += 1
+            return await asyncio.to_thread(call)
+        except QueryError as e:
+            raise RuntimeError(str(e))
+
+    def clear(self):
+        # called after a scrape swaps the DB, reload the indexes in the background before the next lookup
+        self.warming = asyncio.get_running_loop().create_task(asyncio.to_thread(self.db_service.warm))
+        self.warming.add_done_callback(self.warmed)
+
+    def warmed(self, task):
+        # lookups still work after a failed reload, they load what they need in a thread
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Reloading {self.db_service.db_path} after the swap failed: {task.exception()}")
+
+    def stats(self):
+        return {'inline': self.inline, 'threaded': self.threaded, 'generation': self.db_service.generation}
+
+    async def close(self):
+        if self.warming is not None:
+            # a failed reload was already reported by warmed()
+            await asyncio.wait({self.warming})
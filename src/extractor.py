@@ -0,0 +1,44 @@
+from lxml import etree, html
+
+# compiled once per process, these only touch the cells the scraper actually uses
+# instead of building and walking a whole BeautifulSoup tree
+CLASS_SECTIONS = etree.XPath(
+    '//table[contains(concat(" ", normalize-space(@class), " "), " classinfo ")]//tbody'
+)
+SECTION_CELLS = etree.XPath(
+    './/td[@data-label="Section" or @data-label="DaysAndTimes" or @data-label="Room"]'
+)
+
+
+def iter_sections(class_page):
+    """
+    Lazily yields (section text, [days and times lines], [room lines]) for every
+    section on a class search results page, in page order.
+    """
+    if not class_page.strip():
+        return
+
+    document = html.document_fromstring(class_page)
+
+    for section in CLASS_SECTIONS(document):
+        section_text = None
+        times = []
+        rooms = []
+
+        for cell in SECTION_CELLS(section):
+            label = cell.get('data-label')
+            if label == 'Section':
+                # only the first Section cell counts, same as section.find() did
+                if section_text is None:
+                    section_text = ''.join(cell.itertext())
+            elif label == 'DaysAndTimes':
+                times.extend(stripped_lines(cell))
+            else:
+                rooms.extend(stripped_lines(cell))
+
+        yield section_text, times, rooms
+
+
+def stripped_lines(cell):
+    # same output as BeautifulSoup's stripped_strings
+    return [line.strip() for line in cell.itertext() if line.strip()]
@@ -0,0 +1,107 @@
+# upgrades an older class_time_DB.db to SCHEMA_VERSION in place, and adds any tables or
+# indexes a current-version file is missing
+#   1: TEXT days and 'HH:MM' times
+#   2: integer days and minutes, interned buildings and rooms
+#   3: precomputed free_times
+# usage: python migrate_schema.py [db_path]
+import asyncio
+import os
+import sqlite3
+import sys
+
+import aiosqlite
+
+import api_path  # puts api/ on sys.path for the services imports
+from database import LIVE_DB_PATH, SCHEMA, SCHEMA_VERSION, build_free_times, read_meta
+
+
+def migrate(db_path):
+    # files from before the meta table are version 1
+    version = read_meta(db_path, 'schema_version') or 1
+    if version < 2:
+        convert_text_schema(db_path)
+
+    # every statement in SCHEMA is IF NOT EXISTS / OR IGNORE, so this only adds what's missing
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    conn.close()
+
+    if version < 3:
+        asyncio.run(rebuild_free_times(db_path))
+
+    if version < SCHEMA_VERSION:
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+            # new generation so API caches don't mix answers from before and after the migration
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (read_meta(db_path, 'generation') + 1,))
+        conn.close()
+        print(f"Migrated {db_path} from schema version {version} to {SCHEMA_VERSION}.")
+    else:
+        print(f"{db_path} is already at schema version {version}, tables and indexes are up to date.")
+
+
+async def rebuild_free_times(db_path):
+    async with aiosqlite.connect(db_path) as conn:
+        await build_free_times(conn)
+
+
+def convert_text_schema(db_path):
+    # build the new file next to the old one and swap it in, like a finished scrape does
+    new_path = db_path + '.migrating'
+    if os.path.exists(new_path):
+        os.remove(new_path)
+
+    conn = sqlite3.connect(new_path)
+    try:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.execute('ATTACH DATABASE ? AS old', (db_path,))
+
+        conn.execute("""
+            INSERT INTO buildings (name)
+            SELECT building FROM old.classrooms UNION SELECT building FROM old.times
+            ORDER BY 1
+        """)
+        conn.execute("""
+            INSERT INTO classrooms (building_id, floor, room)
+            SELECT b.id, c.floor, c.room
+            FROM (SELECT building, floor, room FROM old.classrooms
+                  UNION SELECT building, floor, room FROM old.times) c
+            JOIN buildings b ON b.name = c.building
+            ORDER BY b.id, c.floor, c.room
+        """)
+        # 'mo'..'su' -> 0..6 and 'HH:MM' -> minutes since midnight
+        conn.execute("""
+            INSERT OR IGNORE INTO times
+            SELECT c.id,
+                   (instr('mo tu we th fr sa su', t.day) - 1) / 3,
+                   CAST(substr(t.start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(t.start_time, 4, 2) AS INTEGER),
+                   CAST(substr(t.end_time, 1, 2) AS INTEGER) * 60 + CAST(substr(t.end_time, 4, 2) AS INTEGER)
+            FROM old.times t
+            JOIN buildings b ON b.name = t.building
+            JOIN classrooms c ON c.building_id = b.id AND c.floor = t.floor AND c.room = t.room
+        """)
+        conn.commit()
+
+        rows = conn.execute('SELECT COUNT(*) FROM times').fetchone()[0]
+        old_rows = conn.execute('SELECT COUNT(*) FROM old.times').fetchone()[0]
+        conn.execute('DETACH DATABASE old')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+
+    if rows != old_rows:
+        os.remove(new_path)
+        raise RuntimeError(f"Migrated {rows} of {old_rows} times rows, leaving {db_path} untouched.")
+
+    old_size = os.path.getsize(db_path)
+    os.replace(new_path, db_path)
+    print(f"Converted {db_path} to integer days and times: {rows} rows, "
+          f"{old_size // 1024} KiB -> {os.path.getsize(db_path) // 1024} KiB.")
+
+
+if __name__ == '__main__':
+    migrate(sys.argv[1] if len(sys.argv) > 1 else LIVE_DB_PATH)
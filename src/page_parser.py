@@ -0,0 +1,59 @@
+from extractor import iter_sections
+
+# everything in here runs inside the scraper's parse worker processes,
+# so it only takes and returns plain strings and tuples
+
+# bump whenever this file or extractor.py would turn the same page into different records (a day or
+# room parsing fix, another section filter). Snapshots saved by an older version are parsed again
+PARSER_VERSION = 1
+
+# a day's index in this list is its code in the DB, same order as DAYS in database.py
+SCRAPED_DAYS = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su']
+NOT_ROOMS = ['Online-Asynchronous', 'TBA', 'Off-Campus', 'Online-Synchronous', 'Soccer Field']
+
+
+def parse_class_page(class_page):
+    # returns [(building, floor, room #, day index, start minute, end minute), ...] for one search results page
+    records = []
+
+    for section, times, rooms in iter_sections(class_page):
+        # not a part of schedule
+        if 'Winter' in section:
+            continue
+        records.extend(split_meetings(times, rooms))
+
+    return records
+
+
+def split_meetings(times, rooms):
+    # example times ['MoWe 10:45AM - 12:00PM', 'MoWe 10:45AM - 12:00PM'], rooms ['Kiely Hall 150', 'Kiely Hall 150']
+    records = []
+
+    for i, room in enumerate(rooms):
+        if room in NOT_ROOMS:
+            continue
+        building, room_num, floor = parse_room(room)
+        meeting = times[i].split()
+        start_time, end_time = to_minutes(meeting[-3]), to_minutes(meeting[-1])
+        for day, scraped_day in enumerate(SCRAPED_DAYS):
+            if meeting[0].find(scraped_day) != -1:
+                records.append((building, floor, room_num, day, start_time, end_time))
+
+    return records
+
+
+def parse_room(room):
+    room = room.split()
+    building = ' '.join(room[:-1]).lower()
+    room_num = room[-1].lower()
+    floor = int(room[-1][0]) if not room[-1][0].isalpha() else int(room[-1][1])
+
+    return building, room_num, floor
+
+
+def to_minutes(time_str):
+    # '1:40PM' -> 820 minutes since midnight
+    hours, minutes = time_str[:-2].split(':')
+    if time_str[-2:] not in ('AM', 'PM') or not 1 <= int(hours) <= 12 or not 0 <= int(minutes) < 60:
+        raise ValueError(f"Unexpected meeting time {time_str!r}")
+    return int(hours) % 12 * 60 + int(minutes) + (720 if time_str[-2:] == 'PM' else 0)
@@ -0,0 +1,147 @@
+# a scrape as a background job on the bot's event loop. Only one runs at a time, /scrape reports
+# its progress while it runs and /scrape_cancel stops it. Lookups keep answering from the live DB
+# the whole time, the new one only replaces it once every unit is scraped
+import asyncio
+import os
+import time
+
+import api_path  # puts api/ on sys.path for the services imports
+from database import DBWriter, build_free_times, discard_stale_temp_DB, over_write_old_DB, scrape_complete
+from scrape_metrics import SCRAPE_SECONDS, SCRAPES
+from scraper import COLLEGE_PAYLOAD, Scraper
+from services.profiler import Profiler
+
+
+class ScrapeJob:
+    def __init__(self, workers=4, requests_per_second=2.0, connection_limit=8, on_swap=None):
+        self.workers = workers
+        self.requests_per_second = requests_per_second
+        self.connection_limit = connection_limit
+        # called after a finished scrape replaced the live DB
+        self.on_swap = on_swap
+
+        # the running task doubles as the lock, start() won't make a second one while it's alive
+        self.task = None
+        # idle, starting, scraping, cancelling or saving, then complete, incomplete, cancelled or failed
+        self.state = 'idle'
+        self.scraper = None
+        self.writer = None
+        self.started = None
+        self.finished = None
+
+        # cProfile of the event loop for a whole scrape, parsing in the worker processes isn't in it
+        self.profiler = Profiler()
+        self.profile_path = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self, profile=False):
+        # False if a scrape is already running
+        if self.running:
+            return False
+        self.state = 'starting'
+        self.scraper = self.writer = None
+        self.started, self.finished = time.time(), None
+        self.profile_path = None
+        self.task = asyncio.get_running_loop().create_task(self.run(profile))
+        self.task.add_done_callback(self.ended)
+        return True
+
+    def cancel(self):
+        # finished units stay in temp_DB.db's manifest, so the next scrape resumes from there.
+        # too late once it's saving, the scrape is complete by then
+        if not self.running or self.state in ('cancelling', 'saving'):
+            return False
+        self.state = 'cancelling'
+        self.task.cancel()
+        return True
+
+    async def wait(self, timeout=None):
+        # True once the job has ended, False if it's still running after timeout seconds
+        if not self.running:
+            return True
+        done, _ = await asyncio.wait({self.task}, timeout=timeout)
+        return bool(done)
+
+    async def run(self, profile=False):
+        print("Starting to scrape...this may take a moment.")
+        capture = self.profiler.start('scrape') if profile else None
+        try:
+            self.state = 'complete' if await self.scrape() else 'incomplete'
+        except Exception as e:
+            self.state = 'failed'
+            print(f"Scrape failed: {e}")
+        finally:
+            if capture is not None:
+                self.profile_path = capture.stop()
+                print(f"Scrape profile written to {self.profile_path}")
+
+    def ended(self, task):
+        # done callback, so the final state and metrics are recorded however the task ended,
+        # including a cancel that lands before run() took its first step
+        if task.cancelled():
+            self.state = 'cancelled'
+        self.finished = time.time()
+        SCRAPES.inc(self.state)
+        SCRAPE_SECONDS.observe(self.finished - self.started, self.state)
+        print(f"Scraping finished in {self.finished - self.started:.2f} seconds.")
+
+        if self.state == 'complete':
+            print("Scraping complete! Data has been saved to the database.")
+        elif self.state == 'cancelled':
+            print("Scrape cancelled, keeping the current database. Run it again to resume.")
+        elif self.state == 'incomplete':
+            # keep temp_DB.db and its manifest so the next /scrape only redoes the unfinished units
+            print("Scrape incomplete, keeping the current database. Run it again to resume.")
+
+    async def scrape(self):
+        self.writer = DBWriter()
+        # a temp_DB.db left by another term or a long abandoned scrape isn't resumed
+        discard_stale_temp_DB(self.writer.db_path, COLLEGE_PAYLOAD['term_value'])
+        self.scraper = Scraper(self.writer, workers=self.workers, requests_per_second=self.requests_per_second,
+                               connection_limit=self.connection_limit)
+
+        self.state = 'scraping'
+        complete = False
+        try:
+            # inside the try, so a cancel or error while opening temp_DB.db still closes the scraper
+            await self.writer.start()
+            majors_list = await self.scraper.get_majors()
+            await self.scraper.scrape_all_schedules(majors_list)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        finally:
+            # also runs on cancel, so whatever was scraped is flushed for the resume
+            await self.scraper.close()
+            if self.writer.started:
+                await self.writer.flush()
+                complete = await scrape_complete(self.writer.conn)
+                if complete:
+                    self.state = 'saving'
+                    await build_free_times(self.writer.conn)
+            await self.writer.close()
+
+        if complete:
+            over_write_old_DB()
+            if self.on_swap is not None:
+                self.on_swap()
+        return complete
+
+    def status(self):
+        if self.started is None:
+            return "No scrape has run since the bot started."
+
+        elapsed = (self.finished or time.time()) - self.started
+        line = f"Scrape {self.state}, {int(elapsed) // 60}m {int(elapsed) % 60:02d}s"
+        if self.scraper is not None:
+            progress = self.scraper.progress
+            requests = self.scraper.session.requests
+            failed = f" ({progress['failed']} failed)" if progress['failed'] else ''
+            line += (f": {progress['done']}/{progress['total']} units{failed}, "
+                     f"{self.writer.rows_written:,} rows written, {requests / max(elapsed, 1):.1f} requests/s")
+        line += "."
+        if self.profile_path is not None:
+            line += f" Profile: {os.path.basename(self.profile_path)}"
+        return line
@@ -0,0 +1,27 @@
+# the scraper's stage metrics, in the registry from api/services/metrics.py so the API's /metrics
+# serves them too (the bot writes its snapshot to METRICS_DIR, see start_writer)
+import api_path  # puts api/ on sys.path for the services imports
+from services.metrics import COUNT_BUCKETS, REGISTRY, SIZE_BUCKETS
+
+HTTP_SECONDS = REGISTRY.histogram('gs_scrape_http_request_seconds', 'Global Search request latency, response read included',
+                                  ['kind'])
+HTTP_BYTES = REGISTRY.histogram('gs_scrape_http_response_bytes', 'Size of Global Search response bodies', ['kind'],
+                                buckets=SIZE_BUCKETS)
+HTTP_REQUESTS = REGISTRY.counter('gs_scrape_http_requests_total', 'Global Search requests by response status',
+                                 ['kind', 'status'])
+RATE_LIMIT_SECONDS = REGISTRY.histogram('gs_scrape_rate_limit_wait_seconds', 'Time spent waiting on the token bucket')
+PARSE_SECONDS = REGISTRY.histogram('gs_scrape_parse_seconds',
+                                   'Time to get the rows out of a results page, parsed or reused from its snapshot',
+                                   ['source'])
+PAGES = REGISTRY.counter('gs_scrape_pages_total', 'Scraped (major, career) units by result', ['result'])
+ROWS = REGISTRY.counter('gs_scrape_rows_total', 'Meeting rows handed to the DB writer')
+FLUSH_SECONDS = REGISTRY.histogram('gs_scrape_db_flush_seconds', 'DBWriter transaction time')
+FLUSH_ROWS = REGISTRY.histogram('gs_scrape_db_flush_rows', 'Meeting rows per DBWriter transaction',
+                                buckets=COUNT_BUCKETS)
+SCRAPES = REGISTRY.counter('gs_scrape_runs_total', 'Finished scrape jobs by final state', ['state'])
+SCRAPE_SECONDS = REGISTRY.histogram('gs_scrape_run_seconds', 'Wall time of a scrape job', ['state'],
+                                    buckets=(60, 120, 300, 600, 1200, 1800, 3600, 7200))
+
+
+def start_writer(role='bot'):
+    REGISTRY.write_periodically(role)
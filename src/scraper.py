@@ -1,39 +1,79 @@
 import asyncio
-import random
+import hashlib
+import json
 import time
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 
-import aiohttp
 from bs4 import BeautifulSoup
 
-from database import initialize_tables, get_temp_connection, insertTime, insertRoom, over_write_old_DB
+import api_path  # puts api/ on sys.path for the services imports
+from database import (DBWriter, build_free_times, discard_stale_temp_DB, finished_units, load_page_snapshots,
+                      over_write_old_DB, record_scrape_start, scrape_complete, seed_manifest)
+from page_parser import parse_class_page
+from rate_limiter import TokenBucket
+from scrape_metrics import PAGES, PARSE_SECONDS, ROWS
+from session_manager import GlobalSearchSession
+
+
+# the institution and term every scrape searches
+COLLEGE_PAYLOAD = {
+    'selectedInstName': 'Queens College | ',
+    'inst_selection': 'QNS01',
+    'selectedTermName': '2025 Fall Term',
+    'term_value': '1259',
+    'next_btn': 'Next'
+}
 
 
 async def main():
-    conn = await get_temp_connection()
-    await initialize_tables(conn)
+    writer = DBWriter()
+    discard_stale_temp_DB(writer.db_path, COLLEGE_PAYLOAD['term_value'])
+    await writer.start()
     start_time = time.time()
-    scrap = Scraper()
+    scrap = Scraper(writer)
     majors_list = await scrap.get_majors()
     # await scrap.scrape_all_schedules(majors_list)
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(elapsed_time)
-    await conn.close()
-    over_write_old_DB()
+    await scrap.close()
+    await writer.flush()
+    complete = await scrape_complete(writer.conn)
+    if complete:
+        await build_free_times(writer.conn)
+    await writer.close()
+    if complete:
+        over_write_old_DB()
+
+def normalized_page_hash(page):
+    # whitespace differences between two renders of the same results don't count as a change
+    return hashlib.sha256(' '.join(page.split()).encode()).hexdigest()
+
 
 class Scraper:
-    def __init__(self):
+    def __init__(self, writer=None, workers=4, requests_per_second=2.0, parse_workers=None, connection_limit=8):
         # we'll write paramaters as they become needed
+        # batched DB writer shared by every push, see DBWriter in database.py
+        self.writer = writer
+
+        # number of (major, career) searches in flight and the global request rate they share
+        self.workers = workers
+        self.rate_limiter = TokenBucket(requests_per_second)
+
+        # result pages are parsed in worker processes so the event loop (and the bot) stays responsive
+        self.parse_pool = ProcessPoolExecutor(max_workers=parse_workers)
         self.url = 'https://globalsearch.cuny.edu/CFGlobalSearchTool/CFSearchToolController'
 
-        self.college_payload = {
-            'selectedInstName': 'Queens College | ',
-            'inst_selection': 'QNS01',
-            'selectedTermName': '2025 Fall Term',
-            'term_value': '1259',
-            'next_btn': 'Next'
-        }
+        self.college_payload = dict(COLLEGE_PAYLOAD)
+
+        # page hashes and records from the last finished scrape, see load_page_snapshots
+        self.previous_pages = {}
+        self.refresh_counts = {'unchanged': 0, 'changed': 0, 'new': 0}
+        # (major, career) units in this scrape, done counts the ones finished by an earlier run too
+        self.progress = {'total': 0, 'done': 0, 'failed': 0}
+
+        # one keep-alive session and institution cookie for every request in the scrape
+        self.session = GlobalSearchSession(self.url, self.college_payload, self.rate_limiter, connection_limit)
 
         self.class_search = {
             'selectedSubjectName': '',
@@ -67,116 +107,107 @@ class Scraper:
 
     # gets all majors for college in payload
     async def get_majors(self):
-        async with aiohttp.ClientSession() as session:
-            async with session.post(self.url, data=self.college_payload) as response:
-                page = await response.text()
-                soup = BeautifulSoup(page, 'html.parser')
+        page = await self.session.select_institution()
+        soup = BeautifulSoup(page, 'html.parser')
 
-                subject_box = soup.find('select', {'class': 'form-search-display'})
-                majors_list = subject_box.findAll('option')[1:]
-                majors_list = [
-                    (major.get_text(), major['value']) for major in majors_list
-                ]
+        subject_box = soup.find('select', {'class': 'form-search-display'})
+        majors_list = subject_box.findAll('option')[1:]
+        majors_list = [
+            (major.get_text(), major['value']) for major in majors_list
+        ]
 
         return majors_list
 
     # feed in a list of majors which scrapes all the info for one major
-    async def get_class_schedule(self, major: tuple, graduateLevel, graduateCode) -> None:
-        async with aiohttp.ClientSession() as session:
-            # load session with university selection cookies
-            await session.post(self.url, data=self.college_payload)
-
-            # load class info for payload
-            self.update_payload(major[0], major[1], graduateLevel, graduateCode)
-
-            # load next session with search results
-            async with session.post(self.url, data=self.class_search) as response:
-                class_page = await response.text()
-                soup = BeautifulSoup(class_page, 'lxml')
-
-                classes = soup.findAll('table', attrs={'class': 'classinfo'})
-                my_classes = {}
-                for classname in classes:
-                    sections = classname.findAll('tbody')
-                    for section in sections:
-                        # not a part of schedule
-                        if 'Winter' in section.find('td', attrs={'data-label': 'Section'}).get_text():
-                            print(section.find('td', attrs={'data-label': 'Section'}).get_text())
-                            continue
-                        my_classes['times'] = [line.strip() for time in section.find_all('td', attrs={'data-label': 'DaysAndTimes'}) for line in time.stripped_strings]
-                        my_classes['rooms'] = [line.strip() for room in section.find_all('td', attrs={'data-label': 'Room'}) for line in room.stripped_strings]
-                        await self.split_and_push_data(my_classes)
-
-
-    def update_payload(self, subjectName, subjectCode, graduateLevel, graduateCode) -> None:
+    async def get_class_schedule(self, major: tuple, graduateLevel, graduateCode) -> int:
+        # load class info for payload, each search gets its own copy so workers don't race
+        payload = self.build_payload(major[0], major[1], graduateLevel, graduateCode)
+
+        # the shared session already carries the university selection cookies
+        class_page = await self.session.search(payload)
+        page_hash = normalized_page_hash(class_page)
+
+        previous = self.previous_pages.get((major[1], graduateCode))
+        if previous is not None and previous[0] == page_hash:
+            # same page as last time, reuse its rows instead of parsing again
+            with PARSE_SECONDS.time('snapshot'):
+                records = [tuple(record) for record in json.loads(previous[1])]
+            result = 'unchanged'
+        else:
+            loop = asyncio.get_running_loop()
+            with PARSE_SECONDS.time('parser'):
+                records = await loop.run_in_executor(self.parse_pool, parse_class_page, class_page)
+            result = 'changed' if previous is not None else 'new'
+        self.refresh_counts[result] += 1
+        PAGES.inc(result)
+
+        for record in records:
+            await self.db_push(*record)
+        ROWS.inc(value=len(records))
+        await self.writer.save_page(major, graduateCode, page_hash, records)
+        return len(records)
+
+
+    def build_payload(self, subjectName, subjectCode, graduateLevel, graduateCode) -> dict:
         temp = {'selectedSubjectName': subjectName, 'subject_name': subjectCode,
                 'selectedCCareerName': graduateLevel, 'courseCareer': graduateCode}
-        self.class_search.update(temp)
+        return {**self.class_search, **temp}
 
 
     #the get_class_schedule function pushes to the database
     async def scrape_all_schedules (self, majorList):
-
+        all_units = []
         for major in majorList:
-            await self.get_class_schedule(major, 'Undergraduate', 'UGRD')
-            await asyncio.sleep(random.uniform(1, 3)) # does this actually make me look less sus? who knows
-
-            await self.get_class_schedule(major, 'Graduate', 'GRAD')
-            await asyncio.sleep(random.uniform(1, 3))
-
-
-    async def split_and_push_data(self, class_info):
-        # example {'time': ['MoWe 10:45AM - 12:00PM', 'MoWe 10:45AM - 12:00PM'], 'room': ['Kiely Hall 150', 'Kiely Hall 150']}
-        scraped_days = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sa', 'Su']
-
-        for i, room in enumerate(class_info['rooms']):
-            if room in ['Online-Asynchronous', 'TBA', 'Off-Campus', 'Online-Synchronous', 'Soccer Field']:
-                continue
-            building, room_num, floor = self.parse_room(room)
-            times = class_info['times'][i].split()
-            for scraped_day in scraped_days:
-                if times[0].find(scraped_day) != -1:
-                    await self.db_push(building, room_num, floor, scraped_day.lower(), times[-3], times[-1])
-
-    def parse_room(self, room):
-        room = room.split()
-        building = ' '.join(room[:-1]).lower()
-        room_num = room[-1].lower()
-        floor = int(room[-1][0]) if not room[-1][0].isalpha() else int(room[-1][1])
-
-        return building, room_num, floor
-
-    def convert_to_military_time(self, start_time, end_time):
-        def to_military_time(time_str):
-            return datetime.strptime(time_str, "%I:%M%p").strftime("%H:%M")
-
-        start_military = to_military_time(start_time)
-        end_military = to_military_time(end_time)
-
-        return start_military, end_military
-
-
-    async def db_push(self, building, room_num, floor, day, start_time, end_time):
-        # should already be lowercase from parse_room
-
-        building = ''.join(building)
-        start_time, end_time = self.convert_to_military_time(start_time, end_time)
-        conn = await get_temp_connection()
-        await insertRoom(conn, (building, floor, room_num))
-        await insertTime(conn, (building, floor, room_num), (day,start_time, end_time))
-
-        def debug_print():
-            print(
-                f""" 
-                    Building: {building} 
-                    Floor number: {floor} 
-                    Room Num: {room_num} 
-                    Day: {day} 
-                    Start_Time: {start_time} 
-                    End_Time: {end_time}
-                """
-            )
-        debug_print()
-        await conn.close()
+            all_units.append((major, 'Undergraduate', 'UGRD'))
+            all_units.append((major, 'Graduate', 'GRAD'))
+
+        # units finished by an earlier, interrupted run are already in temp_DB.db
+        await record_scrape_start(self.writer.conn, self.college_payload['term_value'])
+        await seed_manifest(self.writer.conn, all_units)
+        done = await finished_units(self.writer.conn)
+        self.previous_pages = await load_page_snapshots()
+
+        units = asyncio.Queue()
+        for unit in all_units:
+            if (unit[0][1], unit[2]) not in done:
+                units.put_nowait(unit)
+        self.progress.update(total=len(all_units), done=len(all_units) - units.qsize(), failed=0)
+        print(f"Scraping {units.qsize()} of {len(all_units)} units ({len(done)} already done).")
+
+        # politeness comes from the shared token bucket instead of sleeping after every request
+        async def worker():
+            while not units.empty():
+                major, graduateLevel, graduateCode = units.get_nowait()
+                try:
+                    row_count = await self.get_class_schedule(major, graduateLevel, graduateCode)
+                except Exception as e:
+                    # leave it for the next run instead of losing the whole scrape
+                    print(f"Failed to scrape {major[1]} {graduateCode}: {e}")
+                    await self.writer.mark_unit(major, graduateLevel, graduateCode, 'failed')
+                    self.progress['failed'] += 1
+                    PAGES.inc('failed')
+                    continue
+                await self.writer.mark_unit(major, graduateLevel, graduateCode, 'done', row_count)
+                self.progress['done'] += 1
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            print(f"Units unchanged: {self.refresh_counts['unchanged']}, "
+                  f"changed: {self.refresh_counts['changed']}, new: {self.refresh_counts['new']}")
+
+
+    async def close(self):
+        await self.session.close()
+        self.parse_pool.shutdown()
+
+
+    async def db_push(self, building, floor, room_num, day, start_time, end_time):
+        # should already be lowercase, with day index and minutes since midnight from page_parser
+        await self.writer.put((building, floor, room_num), (day, start_time, end_time))
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
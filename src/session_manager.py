@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import aiohttp
+
+from scrape_metrics import HTTP_BYTES, HTTP_REQUESTS, HTTP_SECONDS, RATE_LIMIT_SECONDS
+
+# the controller sends this form back instead of results once our institution/term selection is gone
+SESSION_EXPIRED_MARKER = 'inst_selection'
+
+
+class GlobalSearchSession:
+    """
+    One pooled aiohttp session shared by the whole scrape. The institution/term
+    selection is posted once and only posted again when the server drops it.
+    """
+
+    def __init__(self, url, college_payload, rate_limiter, connection_limit=8):
+        self.url = url
+        self.college_payload = college_payload
+        self.rate_limiter = rate_limiter
+        self.connection_limit = connection_limit
+
+        self.session = None
+        self.majors_page = None
+        # bumped on every (re)selection so concurrent workers that all see an expired page only reselect once
+        self.selection = 0
+        self.selection_lock = asyncio.Lock()
+        # requests sent so far, for the scrape progress report
+        self.requests = 0
+
+    async def post(self, data, kind='search'):
+        # kind labels the request in the metrics, 'select' for the institution form, 'search' for results
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+        with RATE_LIMIT_SECONDS.time():
+            await self.rate_limiter.acquire()
+        self.requests += 1
+        started = time.perf_counter()
+        async with self.session.post(self.url, data=data) as response:
+            HTTP_REQUESTS.inc(kind, response.status)
+            # an error page would otherwise parse as a subject with no classes
+            response.raise_for_status()
+            body = await response.read()
+        HTTP_SECONDS.observe(time.perf_counter() - started, kind)
+        HTTP_BYTES.observe(len(body), kind)
+        return body.decode(response.get_encoding())
+
+    async def select_institution(self, seen_selection=None):
+        # returns the page after selecting the college, which is also the majors list
+        async with self.selection_lock:
+            if self.majors_page is None or self.selection == seen_selection:
+                self.majors_page = await self.post(self.college_payload, 'select')
+                self.selection += 1
+            return self.majors_page
+
+    async def search(self, payload):
+        if self.majors_page is None:
+            await self.select_institution()
+
+        selection = self.selection
+        page = await self.post(payload)
+
+        if SESSION_EXPIRED_MARKER in page:
+            print(f"Global Search session expired, selecting {self.college_payload['inst_selection']} again.")
+            await self.select_institution(selection)
+            page = await self.post(payload)
+            if SESSION_EXPIRED_MARKER in page:
+                raise RuntimeError('Global Search rejected the search right after selecting the institution again.')
+
+        return page
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None